@@ -26,6 +26,7 @@ from zope.interface import Interface, implements
 
 # visaplan:
 from visaplan.plone.infohubs import make_hubs
+from visaplan.plone.infohubs.manifest import apply_manifest
 
 
 class IHubAndInfo(Interface):
@@ -42,8 +43,14 @@ class Browser(BrowserView):
     def get(self):
         """
         Erzeuge hub und info für den aktuellen Kontext und gib ein dict zurück
+
+        Deklariert die publizierte View die benötigten Schlüssel
+        (infohub_keys, infohub_hub_keys), werden diese vorab ermittelt.
         """
         hub, info = make_hubs(self.context)
+        published = self.request.get('PUBLISHED')
+        if published is not None:
+            apply_manifest(hub, info, published)
         return {'hub': hub,
                 'info': info,
                 }
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Browser @@infohubs-samples - Abruf der Daten des Sampling-Profilers
+
+Liefert die bisher gezählten Schlüssel-Stacks (siehe ..sampling) im
+"collapsed stack"-Format, z. B. zur Weiterverarbeitung mit flamegraph.pl:
+
+  curl -u admin ${SITE_URL}/@@infohubs-samples > samples.txt
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Zope:
+from Products.Five import BrowserView
+
+# visaplan:
+from visaplan.plone.infohubs.sampling import collapsed_stacks
+
+
+class Samples(BrowserView):
+
+    def __call__(self):
+        self.request.response.setHeader('Content-Type',
+                                        'text/plain; charset=utf-8')
+        return collapsed_stacks() + '\n'
+
+
+# vim: ts=8 sts=4 sw=4 si et hls
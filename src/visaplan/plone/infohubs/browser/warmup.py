@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Browser @@infohubs-warmup - Aufwärmen der Caches auf Anforderung
+
+Verwendet die konfigurierten Pfade (warmup-paths, siehe ..warmup),
+ansonsten den aktuellen Kontext, und liefert die Zeiten je Schlüssel
+als Text zurück.
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Zope:
+from Products.Five import BrowserView
+
+# visaplan:
+from visaplan.plone.infohubs.config import config_list
+from visaplan.plone.infohubs.warmup import format_report, warmup
+
+
+class Warmup(BrowserView):
+
+    def __call__(self):
+        paths = config_list('warmup-paths')
+        if not paths:
+            paths = ['/'.join(self.context.getPhysicalPath())]
+        report = warmup(self.context.getPhysicalRoot(), paths)
+        self.request.response.setHeader('Content-Type',
+                                        'text/plain; charset=utf-8')
+        return format_report(report) + '\n'
+
+
+# vim: ts=8 sts=4 sw=4 si et hls
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Access to the product configuration of visaplan.plone.infohubs
+
+Optional features are switched on in the zope.conf file (or, for buildout
+users, in the zope-conf-additional option of the instance part):
+
+    <product-config visaplan.plone.infohubs>
+        warmup-integrations on
+    </product-config>
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six import string_types as six_string_types
+
+# visaplan:
+from visaplan.tools.minifuncs import makeBool
+
+__all__ = [
+        'product_config',  # --> dict
+        'config_flag',     # name [, default] --> bool
+        'config_list',     # name [, default] --> list of str
+        ]
+
+PRODUCT_NAME = 'visaplan.plone.infohubs'
+
+
+def product_config():
+    """
+    Return the <product-config visaplan.plone.infohubs> section as a dict;
+    if there is none (or we don't run in Zope), the dict is empty.
+    """
+    try:
+        # Zope:
+        from App.config import getConfiguration
+    except ImportError:
+        return {}
+    config = getattr(getConfiguration(), 'product_config', None) or {}
+    return config.get(PRODUCT_NAME) or {}
+
+
+def config_flag(name, default=False):
+    """
+    Return the boolean value of the given configuration option
+    """
+    val = product_config().get(name)
+    if val is None:
+        return default
+    return makeBool(val)
+
+
+def config_list(name, default=None):
+    """
+    Return the whitespace-separated values of the given option as a list
+    """
+    val = product_config().get(name)
+    if val is None:
+        return list(default or [])
+    if isinstance(val, six_string_types):
+        return val.split()
+    return list(val)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Cooperating groups of Unitracc objects, from the catalog
+
+The groups which cooperate on an object are returned by its
+getUnitraccGroups method.  If the catalog has a metadata column of the same
+name (which would be registered by the package which provides the content
+types, in its catalog.xml), the value is taken from the brain; otherwise
+(currently: always), the object is woken and asked.  The brains are found by
+restricted searches, and the objects are woken with the permissions of the
+user; objects the user may not see are treated as not found.
+
+>>> class Brain(object):
+...     def __init__(self, uid, groups=MV):
+...         self.UID = uid
+...         if groups is not MV:
+...             self.getUnitraccGroups = groups
+...     def getObject(self):
+...         return Obj()
+>>> class Obj(object):
+...     def getUnitraccGroups(self):
+...         return ['group_woken']
+>>> brain_groups(Brain('a', ['group_a'])), brain_groups(Brain('b'))
+(['group_a'], ['group_woken'])
+>>> brain_groups(Brain('c', None))
+[]
+
+For many UIDs at once, one catalog query is used:
+
+>>> class Catalog(object):
+...     def searchResults(self, UID):
+...         return [Brain(uid, ['group_' + uid]) for uid in UID
+...                 if uid != 'x']
+>>> sorted(groups_by_uid(Catalog(), ['a', 'b', 'x']).items())
+[('a', ['group_a']), ('b', ['group_b']), ('x', None)]
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Zope:
+from AccessControl import Unauthorized
+from Missing import MV
+
+__all__ = [
+        'metadata_groups',  # brain --> list, or None if not in metadata
+        'brain_groups',   # brain --> list
+        'groups_by_uid',  # catalog, uids --> {uid: list or None}
+        ]
+
+COLUMN = 'getUnitraccGroups'
+
+
+def metadata_groups(brain):
+    """
+    Return the cooperating groups (a list) from the metadata of the given
+    brain, or None if the catalog doesn't have the column
+    """
+    val = getattr(brain, COLUMN, MV)
+    if val is MV or callable(val):  # missing, or acquired
+        return None
+    return list(val or [])
+
+
+def brain_groups(brain):
+    """
+    Return the cooperating groups (a list) for the given brain;
+    if the metadata value is missing, the object is woken
+    """
+    val = metadata_groups(brain)
+    if val is None:
+        try:
+            val = brain.getObject().getUnitraccGroups()
+        except (AttributeError, KeyError, Unauthorized):
+            # not a Unitracc object, gone, or not visible for the user
+            val = None
+    return list(val or [])
+
+
+def groups_by_uid(catalog, uids):
+    """
+    Return a dict {uid: list of groups} for the given UIDs, using a single
+    (restricted) catalog query; UIDs which are not found are mapped to None.
+    """
+    uids = list(uids)
+    res = dict.fromkeys(uids)
+    if uids:
+        for brain in catalog.searchResults(UID=uids):
+            res[brain.UID] = brain_groups(brain)
+    return res
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
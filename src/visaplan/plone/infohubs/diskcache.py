@@ -0,0 +1,516 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Optional on-disk cache for large per-site lookup tables
+
+Each worker process used to build the same large lookup tables in its own
+memory:
+
+- uid2path: UID --> physical path, behind info['uid2path'] (and the other
+  uid2... keys)
+- my_translation: "physical path<TAB>language" --> physical path of the
+  translation (empty if there is none), behind info['my_translation']
+- group_title: group id --> title, behind info['group_title']
+
+With this cache, the tables are written once into an SQLite file per site
+which all worker processes read (SQLite maps the file into memory; no
+per-process copies).  The file is stamped with the modification counter of
+the catalog; if the stamp is out of date, lookups fall back to the live
+catalog.  Since group titles are not cataloged, the group_title table is
+used for a limited time only (diskcache-group-title-max-age, in seconds).
+
+The cache is switched on by the product configuration:
+
+    <product-config visaplan.plone.infohubs>
+        diskcache-directory /path/to/var/infohubs
+        # rebuild stale files in a background thread (in one process only):
+        diskcache-rebuild on
+        diskcache-rebuild-interval 300
+        # physical paths; by default, all Plone sites in the Zope root:
+        diskcache-sites /plone
+    </product-config>
+
+The requests never rebuild the tables themselves.  Instead of the
+background thread, a separate job can do it, e.g. using "bin/instance run"
+with a script which calls rebuild_stale_tables(app).
+
+Further tables can be registered by add-on packages (register_table); the
+builder function is called with the hub and yields (key, value) pairs.
+
+>>> import tempfile, os
+>>> fn = os.path.join(tempfile.mkdtemp(), 'site.sqlite')
+>>> tables = DiskTables(fn)
+>>> tables.stamp() is None
+True
+>>> tables.build({'uid2path': [('a1', '/plone/a'), ('b2', '/plone/b')]}, 42)
+>>> tables.stamp()
+42
+>>> sorted(tables.get_many('uid2path', ['a1', 'b2', 'c3']).items())
+[('a1', '/plone/a'), ('b2', '/plone/b')]
+>>> tables.build({'uid2path': [('a1', '/plone/x')]}, 43)
+>>> tables.stamp(), tables.get_many('uid2path', ['a1', 'b2'])
+(43, {'a1': '/plone/x'})
+
+The translations table is built from the catalog, using the index which
+groups the translations (diskcache-translation-index) and the Language
+index:
+
+>>> class Index(object):
+...     def __init__(self, **kw):
+...         self._index = dict([(v, int(k[1:])) for k, v in kw.items()])
+...         self.values = dict([(int(k[1:]), v) for k, v in kw.items()])
+...     def getEntryForObject(self, rid, default=None):
+...         return self.values.get(rid, default)
+>>> class Catalog(object):
+...     indexes = {'UID': Index(r1='de1', r2='en1', r3='de2', r4='img'),
+...                'getCanonicalPath': Index(r1='/p/de/a', r2='/p/de/a',
+...                                          r3='/p/de/b', r4='/p/img'),
+...                'Language': Index(r1='de', r2='en', r3='de', r4='')}
+...     paths = {1: '/p/de/a', 2: '/p/en/a', 3: '/p/de/b', 4: '/p/img'}
+...     def getIndex(self, name):
+...         return self.indexes[name]
+>>> catalog = Catalog()
+>>> catalog._catalog = catalog
+>>> rows = sorted(build_translations({'portal_catalog': catalog}))
+>>> for key, path in rows:
+...     print('%-12s %r' % (key.replace('\\t', ' '), path))
+/p/de/a de   '/p/de/a'
+/p/de/a en   '/p/en/a'
+/p/de/b de   '/p/de/b'
+/p/de/b en   ''
+/p/en/a de   '/p/de/a'
+/p/en/a en   '/p/en/a'
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six import PY2
+from six import text_type as six_text_type
+
+# Standard library:
+import os
+import sqlite3
+from threading import Lock, Thread, local
+from time import sleep, time
+
+# Zope:
+from AccessControl import Unauthorized
+
+try:
+    # Zope:
+    from zope.component.hooks import getSite, setSite
+except ImportError:  # zope.app.component ist veraltet ...
+    # Zope:
+    from zope.app.component.hooks import getSite, setSite
+
+# Local imports:
+from .config import config_flag, config_list, product_config
+from .integrations import integration
+from .utils import catalog_counter, request_cache, site_key
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'DiskTables',
+        'register_table',     # name, builder
+        'disk_tables',        # --> DiskTables for the current site, or None
+        'valid_disk_tables',  # hub, request --> DiskTables or None
+        'rebuild_disk_tables',  # hub --> stamp
+        'rebuild_stale_tables',  # app [, paths] --> [(path, stamp), ...]
+        'disk_translations',  # func, tables, lang, portal, uids2paths
+        'disk_group_title',   # tables, gid --> title or None
+        'diskcache_on_startup',  # subscriber for IProcessStarting
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+MMAP_SIZE = 256 * 1024 * 1024
+CHUNK_SIZE = 500  # SQLite allows 999 variables per statement
+CACHE_KEY = 'disk_tables'
+DEFAULT_INTERVAL = 300  # seconds between checks of the rebuild thread
+DEFAULT_GROUP_TITLE_MAX_AGE = 900  # seconds
+
+
+class DiskTables(object):
+    """
+    The lookup tables of one site, in one SQLite file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._local = local()  # one connection per thread
+        self._build_lock = Lock()
+
+    def _connection(self):
+        """
+        Return the connection of this thread, or None if there is no file;
+        if the file has been replaced (rebuilt), it is reopened.
+        """
+        try:
+            inode = os.stat(self.filename).st_ino
+        except OSError:
+            return None
+        loc = self._local
+        conn = getattr(loc, 'conn', None)
+        if conn is not None and loc.inode == inode:
+            return conn
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(self.filename)
+        conn.execute('PRAGMA mmap_size=%d' % MMAP_SIZE)
+        loc.conn = conn
+        loc.inode = inode
+        return conn
+
+    def _meta(self, name):
+        conn = self._connection()
+        if conn is None:
+            return None
+        row = conn.execute("SELECT value FROM meta WHERE name = ?",
+                           (name,)).fetchone()
+        if row is not None:
+            return row[0]
+
+    def stamp(self):
+        val = self._meta('stamp')
+        if val is not None:
+            return int(val)
+
+    def age(self):
+        """
+        Return the age of the file in seconds (None, if there is none)
+        """
+        val = self._meta('built')
+        if val is not None:
+            return time() - float(val)
+
+    def get_many(self, table, keys):
+        """
+        Return a dict for those of the given keys which are found
+        """
+        conn = self._connection()
+        res = {}
+        if conn is None:
+            return res
+        keys = list(keys)
+        for i in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[i:i+CHUNK_SIZE]
+            query = ('SELECT key, value FROM %s WHERE key IN (%s)'
+                     % (table, ', '.join(['?'] * len(chunk))))
+            for key, value in conn.execute(query, chunk):
+                if PY2:  # like the values of the catalog and the tools
+                    value = value.encode('utf-8')
+                res[str(key)] = value
+        return res
+
+    def build(self, tables, stamp):
+        """
+        Write the given tables (name --> iterable of (key, value)) into a
+        new file which then replaces the old one
+        """
+        tmp = '%s.tmp-%d' % (self.filename, os.getpid())
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.execute('CREATE TABLE meta (name TEXT PRIMARY KEY,'
+                         ' value TEXT)')
+            for name, items in tables.items():
+                conn.execute('CREATE TABLE %s (key TEXT PRIMARY KEY,'
+                             ' value TEXT)' % name)
+                conn.executemany('INSERT OR REPLACE INTO %s VALUES (?, ?)'
+                                 % name, _text_items(items))
+            conn.execute("INSERT INTO meta VALUES ('stamp', ?)",
+                         (str(stamp),))
+            conn.execute("INSERT INTO meta VALUES ('built', ?)",
+                         (repr(time()),))
+            conn.commit()
+        finally:
+            conn.close()
+        os.rename(tmp, self.filename)
+
+
+def _text(val):
+    if isinstance(val, bytes):
+        return val.decode('utf-8')
+    return six_text_type(val)
+
+
+def _text_items(items):
+    for key, value in items:
+        yield _text(key), _text(value)
+
+
+# ------------------------------------------------ [ Registry ... [
+def build_uid2path(hub):
+    catalog = hub['portal_catalog']._catalog
+    paths = catalog.paths
+    for uid, rid in catalog.getIndex('UID')._index.items():
+        if not isinstance(rid, int):  # FieldIndex
+            rid = rid.minKey()
+        path = paths.get(rid)
+        if path is not None:
+            yield uid, path
+
+
+def build_translations(hub):
+    """
+    Yield ("path<TAB>language", path of the translation) pairs, for every
+    object which has a language, and every language of the site
+    (an empty path, if there is no translation)
+    """
+    catalog = hub['portal_catalog']._catalog
+    paths = catalog.paths
+    name = product_config().get('diskcache-translation-index',
+                                'getCanonicalPath')
+    try:
+        groups_index = catalog.getIndex(name)
+        lang_index = catalog.getIndex('Language')
+    except KeyError as e:
+        logger.warning('no translations table: index %s missing', e)
+        return
+    groups = {}  # canonical --> {language: path}
+    languages = set()
+    for rid in catalog.getIndex('UID')._index.values():
+        if not isinstance(rid, int):  # FieldIndex
+            rid = rid.minKey()
+        lang = lang_index.getEntryForObject(rid, None)
+        if not lang:  # language-neutral: no translations
+            continue
+        path = paths.get(rid)
+        group = groups_index.getEntryForObject(rid, None)
+        if path is None or group is None:
+            continue
+        languages.add(lang)
+        groups.setdefault(group, {})[lang] = path
+    for translations in groups.values():
+        for path in translations.values():
+            for lang in languages:
+                yield '%s\t%s' % (path, lang), translations.get(lang, '')
+
+
+def build_group_titles(hub):
+    portal = hub['portal_url'].getPortalObject()
+    groupinfo = integration('groupinfo_factory')(portal, 1, 1)
+    for gid in hub['portal_groups'].getGroupIds():
+        title = groupinfo(gid)['group_title']
+        if title is not None:
+            yield gid, title
+
+
+TABLE_BUILDERS = {
+    'uid2path': build_uid2path,  # UID --> physical path
+    'my_translation': build_translations,  # path, language --> path
+    'group_title': build_group_titles,  # group id --> title
+    }
+
+
+def register_table(name, builder):
+    TABLE_BUILDERS[name] = builder
+
+
+_TABLES = {}  # site key --> DiskTables
+_LOCK = Lock()
+
+
+def disk_tables():
+    """
+    Return the DiskTables object of the current site;
+    None, if the cache is not configured
+    """
+    directory = product_config().get('diskcache-directory')
+    if not directory:
+        return None
+    key = site_key()
+    try:
+        return _TABLES[key]
+    except KeyError:
+        pass
+    name = '_'.join([part for part in (key or ('root',)) if part])
+    with _LOCK:
+        if key not in _TABLES:
+            _TABLES[key] = DiskTables(os.path.join(directory,
+                                                   name + '.sqlite'))
+        return _TABLES[key]
+
+
+def catalog_stamp(hub):
+    return catalog_counter(hub['portal_catalog'])
+
+
+def rebuild_disk_tables(hub, blocking=True):
+    """
+    (Re)build the tables of the current site; return the stamp
+    (None, if not blocking and another thread is rebuilding already)
+    """
+    tables = disk_tables()
+    if tables is None:
+        return None
+    stamp = catalog_stamp(hub)
+    if stamp is None:
+        return None
+    if not tables._build_lock.acquire(blocking):
+        return None
+    try:
+        tables.build(dict([(name, builder(hub))
+                           for name, builder in TABLE_BUILDERS.items()
+                           ]),
+                     stamp)
+    finally:
+        tables._build_lock.release()
+    logger.info('%s rebuilt (stamp %s)', tables.filename, stamp)
+    return stamp
+
+
+def group_title_max_age():
+    return float(product_config().get('diskcache-group-title-max-age',
+                                      DEFAULT_GROUP_TITLE_MAX_AGE))
+
+
+def valid_disk_tables(hub, request):
+    """
+    Return the DiskTables object if it matches the live catalog;
+    the check is done once per request.  Stale tables are not rebuilt here
+    (see rebuild_stale_tables).
+    """
+    cache = request_cache(request)
+    try:
+        return cache[CACHE_KEY]
+    except KeyError:
+        pass
+    tables = disk_tables()
+    if tables is not None:
+        stamp = catalog_stamp(hub)
+        if stamp is None or tables.stamp() != stamp:
+            tables = None
+    cache[CACHE_KEY] = tables
+    return tables
+# ------------------------------------------------ ] ... Registry ]
+
+
+# ---------------------------------------------- [ Lookups ... [
+def disk_translations(func, tables, lang, portal, uids2paths):
+    """
+    Wrap the given lookup function of info['my_translation']
+    (spec --> object or None) by a function which uses the translations
+    table; specs which are not found there are given to func.
+    """
+
+    def lookup(spec):
+        for key, val in spec:
+            if not val:
+                continue
+            if key == 'path':
+                path = '/'.join(portal.getPhysicalPath()
+                                + (val.lstrip('/'),))
+            elif key == 'uid':
+                path = uids2paths([val])[val]
+            else:
+                continue
+            if path is None:
+                break
+            row = '%s\t%s' % (path, lang)
+            found = tables.get_many('my_translation', [row]).get(row)
+            if found is None:
+                break
+            if not found:  # no translation in this language
+                return None
+            try:
+                return portal.restrictedTraverse(found)
+            except (AttributeError, KeyError, Unauthorized):
+                break  # vanished or protected in the meantime
+        return func(spec)
+
+    return lookup
+
+
+def disk_group_title(tables, gid):
+    """
+    Return the title of the given group, or None if not found in the
+    (recent enough) group_title table
+    """
+    age = tables.age()
+    if age is None or age > group_title_max_age():
+        return None
+    return tables.get_many('group_title', [gid]).get(gid)
+# ---------------------------------------------- ] ... Lookups ]
+
+
+# --------------------------------------- [ Rebuilding job ... [
+def rebuild_stale_tables(app, paths=None):
+    """
+    (Re)build the tables of the given sites (physical paths; by default the
+    configured diskcache-sites, or all Plone sites in the Zope root) if they
+    are out of date; return a list of (path, stamp) tuples of the rebuilt
+    ones.  For background threads and separate jobs; not for requests.
+    """
+    # Local imports:
+    from .hubs import make_hubs  # (circular import)
+    if paths is None:
+        paths = config_list('diskcache-sites') or [
+                '/'.join(site.getPhysicalPath())
+                for site in app.objectValues('Plone Site')
+                ]
+    max_age = group_title_max_age()
+    res = []
+    for path in paths:
+        site = app.unrestrictedTraverse(path)
+        old_site = getSite()
+        setSite(site)
+        try:
+            tables = disk_tables()
+            if tables is None:
+                return res
+            hub, info = make_hubs(site)
+            age = tables.age()
+            if (tables.stamp() == catalog_stamp(hub)
+                    and age is not None and age <= max_age):
+                continue
+            res.append((path, rebuild_disk_tables(hub)))
+        finally:
+            setSite(old_site)
+    return res
+
+
+def _rebuild_loop(interval):
+    # Zope:
+    import transaction
+    import Zope2
+    from Testing.makerequest import makerequest
+    while True:
+        app = makerequest(Zope2.app())
+        try:
+            rebuild_stale_tables(app)
+        except Exception:
+            logger.exception('disk cache rebuild failed')
+        finally:
+            transaction.abort()
+            app._p_jar.close()
+        sleep(interval)
+
+
+def diskcache_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting:
+    start the rebuilding thread, if the diskcache-rebuild option is on
+    """
+    if not product_config().get('diskcache-directory'):
+        return
+    if not config_flag('diskcache-rebuild'):
+        return
+    interval = float(product_config().get('diskcache-rebuild-interval',
+                                          DEFAULT_INTERVAL))
+    thread = Thread(target=_rebuild_loop, args=(interval,),
+                    name='infohubs-diskcache')
+    thread.daemon = True
+    thread.start()
+    logger.info('disk cache rebuilding thread started (every %s s)',
+                interval)
+# --------------------------------------- ] ... Rebuilding job ]
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
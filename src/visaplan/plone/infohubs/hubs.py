@@ -4,6 +4,83 @@ Unterstützung zum Sammeln von kontextbezogenen Informationen
 
 Verwendung:
     hub, info = make_hubs(self.context)
+
+Im "tracked"-Modus hält info die Herkunft jedes Werts fest:
+
+>>> class Request(object):
+...     form = {'audit-mode': 'yes'}
+...     def __init__(self):
+...         self.other = {}
+>>> class Context(object):
+...     portal_type = 'Document'
+...     def __init__(self):
+...         self.REQUEST = Request()
+...     def keys(self):  # (for the hub, which is a dict)
+...         return []
+...     def Title(self):
+...         return 'Some document'
+>>> context = Context()
+>>> hub, info = make_hubs(context, tracked=True)
+>>> info['skip_desktop_crumbs'], info.provenance('skip_desktop_crumbs')
+(False, 'default')
+>>> info['portal_type'], info.provenance('portal_type')
+('Document', 'computed')
+>>> info['personal_desktop_done'] = True
+>>> info.provenance('personal_desktop_done'), info.injected_overrides()
+('injected', ['personal_desktop_done'])
+
+Nach info.freeze() werden Werte weiterhin bei Bedarf ermittelt, aber nicht
+mehr von außen gesetzt:
+
+>>> info.freeze()
+>>> info['view_template_done'] = True
+Traceback (most recent call last):
+  ...
+ValueError: Can't add True as 'view_template_done': info is frozen
+>>> info['audit-mode'], info.provenance('audit-mode')
+(True, 'computed')
+
+Wovon die Ausgabe abhängt, wird festgehalten (--> .variance); der Wert für
+audit-mode wurde den Formulardaten entnommen (request_var), die für jeden
+Request verschieden sein können; es gibt also keinen Fingerabdruck, der für
+alle Benutzer gleich wäre:
+
+>>> from visaplan.plone.infohubs.variance import request_variance
+>>> record = request_variance(context.REQUEST)
+>>> sorted(record.vary()), record.fingerprint()
+(['request'], None)
+
+Nur "kalte" Zugriffe werden ermittelt (und ggf. protokolliert, siehe
+.tracing); "warme" Zugriffe finden den Wert im dict vor:
+
+>>> from visaplan.plone.infohubs import tracing
+>>> exporter = tracing.ListExporter()
+>>> tracer = tracing.enable_tracing(exporter)
+>>> info['context_title']
+'Some document'
+>>> info['context_title']
+'Some document'
+>>> [(span['attributes']['infohubs.hub'], span['attributes']['infohubs.key'])
+...  for span in exporter.spans]
+[('info', 'context_title')]
+>>> tracing.disable_tracing()
+
+Hub-Schlüssel anderer Pakete (--> .providers) haben Vorrang vor den
+allgemeinen Namensregeln (hier: Browser), nicht aber vor den eingebauten
+Schlüsseln (hier: 'pc' für das Tool portal_catalog):
+
+>>> from visaplan.plone.infohubs.providers import (
+...     register_hub_resolver, unregister_hub_resolver)
+>>> def resolver(context, name):
+...     return 'resolved %s' % name
+>>> register_hub_resolver('some_browser', resolver)
+>>> register_hub_resolver('pc', resolver)
+>>> context.portal_catalog = 'the catalog'
+>>> hub, info = make_hubs(context)
+>>> hub['some_browser'], hub['pc']
+('resolved some_browser', 'the catalog')
+>>> unregister_hub_resolver('some_browser')
+>>> unregister_hub_resolver('pc')
 """
 
 # Python compatibility:
@@ -11,11 +88,10 @@ from __future__ import absolute_import, print_function
 
 from six import string_types as six_string_types
 from six.moves import map
-from six.moves._thread import get_ident
 
 __author__ = "Tobias Herp <tobias.herp@visaplan.com>"
 VERSION = (1,  # initial version
-           5,  # info['uid2path']
+           6,  # info['uid2path'].many, info['uid2fullpath'].many
            )
 __version__ = '.'.join(map(str, VERSION))
 __all__ = [
@@ -30,7 +106,6 @@ import pkg_resources
 
 # Standard library:
 from collections import Counter, defaultdict
-from time import strftime
 
 # Zope:
 from AccessControl import Unauthorized
@@ -48,17 +123,53 @@ from visaplan.tools.classes import (
     WriteProtected,
     make_width_getter,
     )
-from visaplan.tools.minifuncs import gimme_False, makeBool
+from visaplan.tools.minifuncs import gimme_False
 
 # Local imports:
-from .utils import (
+from . import tracing
+from .cooperation import groups_by_uid, metadata_groups
+from .diskcache import (
+    disk_group_title,
+    disk_translations,
+    valid_disk_tables,
+    )
+from .identity import request_identity
+from .integrations import integration
+from .pdfpool import checkout_pdfcreator
+from .profiles import export_profile, export_profile_title
+from .providers import (
+    PER_CONTEXT,
+    PER_REQUEST,
+    dispatch_tables,
+    process_values,
+    )
+from .requestvars import (
+    MISSING,
+    REQUEST_VARS,
+    attribute_name,
+    request_var_parser,
+    )
+from .session import LazySessionProxy
+from .structure import find_book_index
+from .translations import cached_translations, request_language
+from .urls import request_urls
+from .utils import (  # noqa: F401 -- TIMESTAMP_FN: was defined here
+    TIMESTAMP_FN,
+    BulkProxy,
     attribute_factory,
     false_by_default,
     gimme_0,
     gimme_1,
     make_toolDetector,
+    parse_named_sizes,
+    request_cache,
+    request_clock,
     sorted_nonempty_item_tuples,
     )
+from .variance import record_variance
+from .viewcache import get_browser
+from .viewstate import view_state
+from .wellknown import wellknown_brain, wellknown_url
 
 # Logging / Debugging:
 from pdb import set_trace
@@ -121,8 +232,12 @@ else:
 
 
 # ------------------------------------------------------ [ Daten ... [
-TIMESTAMP_FN = '%Y-%m-%d_%H%M%S'  # Timestamp-Format für Dateinamen
 SESSIONKEY_DESKTOPGROUPS = 'unitracc_desktop_groups'
+# Herkunft der Werte im "tracked"-Modus (make_hubs(..., tracked=True)):
+COMPUTED = 'computed'  # durch eine Funktion aus FUNCMAP ermittelt
+DEFAULT = 'default'    # ein bloßer Vorgabewert (z. B. false_by_default)
+INJECTED = 'injected'  # von außen gesetzt
+DEFAULT_FACTORIES = frozenset([false_by_default, gimme_0, gimme_1])
 # ------------------------------------------------------ ] ... Daten ]
 
 
@@ -180,19 +295,25 @@ def get_tool(context, name):
     return getToolByName(context, name)
 
 
+def get_tool_method(context, spec):
+    toolname, methodname = spec
+    return getattr(getToolByName(context, toolname), methodname)
+
+
 def getAdapter(context, name):
     return getComponentAdapter(context, name=name)
 
 
 def getBrowser(context, name):
-    return context.restrictedTraverse('@@' + name, None)
+    # Views (auch fehlende) werden prozeßweit gecacht (--> .viewcache):
+    return get_browser(context, name)
 
 
 def getView(context, name):
     return context.restrictedTraverse(name)
 
 
-def make_hubs(context, debug=False):
+def make_hubs(context, debug=False, tracked=False):
     """
     Erzeuge die beiden (speziellen) dict-Objekte 'hub' und 'info',
     die bestimmte Informationen puffern, die für den aktuellen Kontext nur
@@ -208,7 +329,18 @@ def make_hubs(context, debug=False):
       die lediglich getToolByName-Aufrufe verpacken
     - einmal ermittelte Informationen können zur weiteren Verwendung im
       selben Request weitergereicht werden
+
+    Weitere Schlüssel können von anderen Paketen bereitgestellt werden
+    (--> .providers).
+
+    Mit tracked=True wird die Herkunft jedes Werts festgehalten
+    (info.provenance(key) --> COMPUTED, DEFAULT oder INJECTED);
+    nach info.freeze() können keine Werte mehr von außen gesetzt werden,
+    so daß ein info-Objekt gefahrlos von mehreren Renderern geteilt werden
+    kann.
     """
+    # von anderen Paketen bereitgestellte Schlüssel (--> .providers):
+    info_providers, hub_resolvers = dispatch_tables()
 
     class ToolsHub(dict):
         """
@@ -228,6 +360,9 @@ def make_hubs(context, debug=False):
            zu beschaffen mit getToolByName.
         5. Was übrigbleibt, muß ein Browser sein.
         """
+        # bei deklariertem Bedarf (--> .manifest.apply_manifest):
+        declared = None
+        undeclared = None
 
         def __getitem__(self, key):
             try:
@@ -237,32 +372,59 @@ def make_hubs(context, debug=False):
                     print('*** key=%(key)r:' % locals())
                     set_trace()
                 contextonly = 0
+                args = None
                 if key in NAMED_ADAPTERS:
                     val = NAMED_ADAPTERS[key]
                     if val is None:
                         method = getAdapter
+                        kind = 'adapter'
                     elif isinstance(val, six_string_types):
+                        # Abkürzung für den Namen des Tools:
                         method = get_tool
+                        kind = 'tool'
+                        args = [context, val]
                     elif isinstance(val, tuple):
-                        raise ValueError('hub[%(key)r]: tuple values %(val)s'
-                                         ' not (yet?) supported'
-                                         % locals())
+                        # (tool, method): die gebundene Methode
+                        method = get_tool_method
+                        kind = 'tool'
+                        args = [context, val]
                     else:
                         method = val
+                        kind = 'function'
                         contextonly = True
+                # von anderen Paketen (--> .providers); Vorrang nur vor den
+                # allgemeinen Namensregeln:
+                elif key in hub_resolvers:
+                    method = hub_resolvers[key]
+                    kind = 'resolver'
                 elif key.endswith('view') or '-' in key:
                     method = getView
+                    kind = 'view'
                 elif looksLikeATool(key):
                     method = get_tool
+                    kind = 'tool'
                 else:
                     method = getBrowser
-
-                args = [context]
-                if not contextonly:
-                    args.append(key)
-                val = method(*args)
+                    kind = 'browser'
+
+                if args is None:
+                    args = [context]
+                    if not contextonly:
+                        args.append(key)
+                tracer = tracing.TRACER
+                if tracer is None:
+                    val = method(*args)
+                else:
+                    span = tracer.start(key, kind, 'hub')
+                    try:
+                        val = method(*args)
+                    finally:
+                        tracer.finish(span)
+                    val = tracer.wrap(key, val)
 
                 dict.__setitem__(self, key, val)
+                if self.declared is not None and key not in self.declared:
+                    self.undeclared.add(key)
                 return dict.__getitem__(self, key)
 
     hub = ToolsHub(context)
@@ -270,8 +432,16 @@ def make_hubs(context, debug=False):
     def get_uid():
         return IUUID(context, None)
 
+    def get_book_index():
+        # je Request und Buch nur einmal erzeugt (--> .structure)
+        return find_book_index(hub, info)
+
     def get_structure_number():
         if info['isBook']:
+            # die Nummern werden je Request und Buch ermittelt:
+            index = info['book_index']
+            if index is not None:
+                return index.st_num(info['my_uid'])
             structurenumber = hub['structurenumber']
             if structurenumber is not None:
                 my_uid = info['my_uid']
@@ -281,12 +451,19 @@ def make_hubs(context, debug=False):
             return None
 
     def detect_book():
+        # je Request und Buch nur einmal gefragt:
+        index = info['book_index']
+        if index is not None and index.isBook is not None:
+            return index.isBook
         book = hub['book']
         if book is None:
             return None
         return bool(book.isBook(info['context_as_brain']))
 
     def detect_presentation():
+        index = info['book_index']
+        if index is not None and index.isPresentation is not None:
+            return index.isPresentation
         p = hub['presentation']
         if p is None:
             return None
@@ -294,21 +471,15 @@ def make_hubs(context, debug=False):
         return p.isPresentation(info['my_uid'])
 
     def detect_structual():
-        structuretype = hub['structuretype']
-        if structuretype is None:
+        # der Index wird via @@structuretype gefunden:
+        if info['book_index'] is not None:
+            return True
+        if hub['structuretype'] is None:
             return None
-        return bool(structuretype.getStructureFolderAsBrain(
-                                            info['context_as_brain']))
+        return False
 
     def detect_bracket_default():
-        # visaplan:
-        from visaplan.plone.unitracctool.unitraccfeature.browser import (
-            FEATURESINFO,
-            )
-        return FEATURESINFO['bracket_default']
-
-    def get_audit_mode():
-        return makeBool(info['request_var'].get('audit-mode', 'true'))
+        return integration('FEATURESINFO')['bracket_default']
 
     def get_request():
         return context.REQUEST
@@ -320,56 +491,64 @@ def make_hubs(context, debug=False):
     def get_form():
         return info['request'].form
 
+    def parse_request_vars():
+        # alle deklarierten Request-Variablen in einem Durchgang
+        # (--> .requestvars.REQUEST_VARS)
+        return request_var_parser()(info['request_var'])
+
+    def make_request_var_getter(attr):
+        def get_request_var():
+            return getattr(info['request_vars'], attr)
+        return get_request_var
+
+    def get_identity():
+        # je Request nur einmal ermittelt (--> .identity)
+        return request_identity(hub, info['request'])
+
     def detect_logged_in():
-        pm = hub['portal_membership']
-        return not pm.isAnonymousUser()
+        return not info['identity'].anonymous
 
     def detect_user_object():
         # Das User-Objekt des angemeldeten Users, oder None
-        pm = hub['portal_membership']
-        if pm.isAnonymousUser():
-            return None
-        return pm.getAuthenticatedMember()
+        return info['identity'].user_object
 
     def detect_author_object():
-        loggedin_id = info['user_id']
-        if loggedin_id is not None:
-            return hub['author'].getByUserId(loggedin_id)
+        return info['identity'].author_object(hub)
 
     def detect_user_id():
-        o = info['user_object']
-        if o is not None:
-            return o.getId()
-        return None
+        return info['identity'].user_id
 
     def detect_user_email():
-        o = info['author_object']
-        if o is not None:
-            return o.getEmail()
-        return None
+        return info['identity'].user_email(hub)
 
     def detect_cooperating_groups():
         # Zusammenarbeitende Gruppen am Unitracc-Objekt im Kontext
         if info['portal_type'] == 'Folder':
             return []
+        # ist das Katalogobjekt schon bekannt, wird ggf. die Metadatenspalte
+        # verwendet (--> .cooperation):
+        brain = dict.get(info, 'context_as_brain')
+        if brain is not None:
+            val = metadata_groups(brain)
+            if val is not None:
+                return val
         try:
             return context.getUnitraccGroups() or []
-        except Exception as e:
-            pp([('context:', context),
-                ('info:', 'cooperating_groups'),
-                ('error:', e),
-                ])
+        except (AttributeError, Unauthorized):  # kein Unitracc-Objekt
             return []
 
     def detect_group_id():
         # gid: für Schreibtischfunktionalität verwendet
         # Es wird die "effektive" Gruppen-ID zurückgegeben, die ggf. den
         # Sitzungsdaten entnommen wird
+        if not info['logged_in']:
+            # Anonymous hat keine Schreibtischgruppen;
+            # die Sitzung wird nicht angefaßt:
+            return None
         groups_raw = info['session'][SESSIONKEY_DESKTOPGROUPS]
         groups_stack = UniqueStack(groups_raw or [])
-        try:
-            gid = info['request_var']['gid']
-        except KeyError:
+        gid = info['request_vars'].requested_gid
+        if gid is MISSING:
             # gid nicht angegeben --> Sitzungsdaten befragen
             coop_groups = list(info['cooperating_groups'])
             if info['portal_type'] == 'Folder':
@@ -401,32 +580,25 @@ def make_hubs(context, debug=False):
             return 'ERROR'
         else:
             # gid wurde angegeben --> in die Sitzungsdaten schreiben
-            if gid == 'None' or not gid:
-                gid = None
             groups_stack.append(gid)
             if groups_stack != groups_raw:
                 info['session'][SESSIONKEY_DESKTOPGROUPS] = groups_stack
             return gid
 
-    def managed_group_id():
-        # group_id: im Management-Interface verwendet.
-        # Die Abweichung ist nützlich bei der Generierung von Breadcrumbs!
-        gid = info['request_var'].get('group_id')
-        if gid == 'None':
-            return None
-        return gid or None
-
     def mirror_group_id():
         return info['gid']
 
     def detect_group_title():
         # gid: für Schreibtischfunktionalität verwendet
-        # visaplan:
-        from visaplan.plone.groups.groupsharing.browser import (
-            groupinfo_factory,
-            )
+        groupinfo_factory = integration('groupinfo_factory')
         if not info['gid']:
             return None
+        # ggf. aus dem Plattencache (--> .diskcache):
+        tables = valid_disk_tables(hub, info['request'])
+        if tables is not None:
+            title = disk_group_title(tables, info['gid'])
+            if title is not None:
+                return title
         return groupinfo_factory(context, 1, 1
                                  )(info['gid']
                                    )['group_title']
@@ -434,50 +606,60 @@ def make_hubs(context, debug=False):
     def managed_group_title():
         # group_id: im Management-Interface verwendet.
         # Die Abweichung ist nützlich bei der Generierung von Breadcrumbs!
-        # visaplan:
-        from visaplan.plone.groups.groupsharing.browser import (
-            groupinfo_factory,
-            )
+        groupinfo_factory = integration('groupinfo_factory')
         if not info['group_id']:
             return None
+        tables = valid_disk_tables(hub, info['request'])
+        if tables is not None:
+            title = disk_group_title(tables, info['group_id'])
+            if title is not None:
+                return title
         return groupinfo_factory(context, 1, 1
                                  )(info['group_id']
                                    )['group_title']
 
-    def detect_export_profile_id():
-        return info['request_var'].get('pid')
-
     def detect_export_profile():
+        # einmal je Prozeß geladen (--> .profiles):
         pid = info['export_profile_id']
         if pid:
-            return hub['export'].getRawProfile(pid)
+            return export_profile(hub, pid)
 
     def detect_export_profile_title():
         # Titel des Exportprofils
         pid = info['export_profile_id']
         if pid:
-            return hub['export'].getProfileTitle(pid)
+            return export_profile_title(hub, pid)
 
     def detect_template_id():
         return hub['templateid']()
 
+    def get_view_state():
+        # context_state und portal_state in einem Durchgang,
+        # einmal je Request und Kontext (--> .viewstate):
+        return view_state(hub, context, info['request'])
+
     def get_is_view_template():
-        return hub['plone_context_state'].is_view_template()
+        return info['view_state'].is_view_template
 
     def get_view_template_id():
-        return hub['plone_context_state'].view_template_id()
+        return info['view_state'].view_template_id
 
     def get_view_url():
-        return hub['plone_context_state'].view_url()
+        return info['view_state'].view_url
 
     def detect_path():
-        return context.absolute_url_path()
+        # aus dem URL des Elternobjekts abgeleitet, soweit bekannt
+        # (--> .urls):
+        request = getattr(context, 'REQUEST', None)
+        if request is None:  # z. B. in Skripten
+            return context.absolute_url_path()
+        return request_urls(request).url_path(context.getPhysicalPath())
 
     def detect_portal_url():
-        return hub['portal']().absolute_url()
+        return info['view_state'].portal_url
 
     def detect_portal_object():
-        return hub['plone_portal_state'].portal()
+        return info['view_state'].portal
 
     def detect_temp_folder():
         return info['portal_object'].temp
@@ -497,20 +679,20 @@ def make_hubs(context, debug=False):
         return context.portal_type
 
     def detect_context_url():
-        return context.absolute_url()
+        request = getattr(context, 'REQUEST', None)
+        if request is None:
+            return context.absolute_url()
+        return request_urls(request).url(context.getPhysicalPath())
 
     def detect_context_title():
         return context.Title()
 
     def detect_desktop_brain():
-        # visaplan:
-        from visaplan.plone.unitracctool.unitraccfeature.utils import (
-            MYUNITRACC_UID,
-            )
-        return hub['getbrain'](MYUNITRACC_UID)
+        # UID und Pfad werden je Site nur einmal ermittelt (--> .wellknown)
+        return wellknown_brain(hub, 'desktop')
 
     def detect_desktop_url():
-        return info['desktop_brain'].getURL()
+        return wellknown_url(hub, info['request'], 'desktop')
 
     def detect_has_uid():
         try:
@@ -520,9 +702,6 @@ def make_hubs(context, debug=False):
             print('detect_has_uid:', e)
             return False
 
-    def requested_uid():
-        return info['request_var'].get('uid') or None
-
     def detect_context_brain():
         try:
             uid = info['my_uid']
@@ -531,9 +710,6 @@ def make_hubs(context, debug=False):
         except AttributeError:
             return None
 
-    def make_tooltip_divs():
-        return makeBool(info['request_var'].get('tooltip_divs', 'yes'))
-
     def make_permission_proxy():
         pm = hub['portal_membership']
         cp = pm.checkPermission
@@ -555,25 +731,29 @@ def make_hubs(context, debug=False):
 
     def make_timestamp_fn():
         # ein für den gesamten Request konstanter Zeitstempel,
-        # geeignet für die Verwendung in Dateinamen
-        return strftime(TIMESTAMP_FN)
+        # geeignet für die Verwendung in Dateinamen:
+        return info['request_clock'].timestamp_fn
+
+    def get_thread_ident():
+        return info['request_clock'].thread_ident
+
+    def get_request_clock():
+        # Zeitstempel und Thread-ID, einmal je Request (--> .utils):
+        return request_clock(info['request'])
 
     def detect_current_language():
-        return hub['plone_portal_state'].language()
+        # einmal je Request ermittelt (--> .translations):
+        return request_language(hub, info['request'])
 
     def get_session_proxy():
-        # visaplan:
-        from visaplan.plone.tools.context import make_SessionDataProxy
-        return make_SessionDataProxy(context)
+        # eine Sitzung wird erst beim Schreiben angelegt (--> .session):
+        return LazySessionProxy(getToolByName(context,
+                                              'session_data_manager'))
 
     def get_is_member_of():  # gibt eine Funktion zurück
-        # visaplan:
-        from visaplan.plone.groups.groupsharing.browser import (
-            is_member_of__factory,
-            )
         if info['user_id'] is None:
             return gimme_False  # wg. Unterstützung von Argumenten
-        return is_member_of__factory(context, info['user_id'])
+        return integration('is_member_of__factory')(context, info['user_id'])
 
     def get_is_mine():
         if info['user_id'] is None:  # Anonymous
@@ -584,17 +764,10 @@ def make_hubs(context, debug=False):
         return info['user_id'] == info['context_owner']
 
     def make_pdfCreator():
-        # erzeuge einen PDFCreator, der seinerseits den PDFreactor kapselt;
-        # lade die Lizenzdaten, und
-        # füge Cookies hinzu
-        # visaplan:
-        from visaplan.plone.pdfexport.creator import PDFCreator
-        creator = PDFCreator({'context': context,
-                              'cookie': info['request'].cookies,
-                              })
-        creator.set_key()
-        creator.setCookies()
-        return creator
+        # ein PDFCreator, der seinerseits den PDFreactor kapselt,
+        # aus dem Pool (Lizenzdaten bereits geladen);
+        # an Kontext und Cookies gebunden, am Ende des Requests zurückgegeben
+        return checkout_pdfcreator(context, info['request'])
 
     def detect_context_owner():
         return context.Creator()
@@ -612,12 +785,8 @@ def make_hubs(context, debug=False):
         popr = hub['portal_properties']
         impr = popr.imaging_properties
         alls = impr.allowed_sizes
-        dic = {}
-        for line in alls.split('\n'):
-            key, size = line.strip().split()
-            dim = list(map(int, size.split(':')))
-            dic[key] = dim
-        return dic
+        # je Prozeß nur einmal geparst (--> .utils):
+        return parse_named_sizes(alls)
 
     def uid2brain_dict():
         rootfunc = hub['portal_catalog']._catalog
@@ -630,43 +799,93 @@ def make_hubs(context, debug=False):
                 return brain
         return Proxy(func)
 
+    def get_uids2paths():
+        # für .many: UIDs --> physische Pfade, ggf. aus dem Plattencache
+        # (--> .diskcache), ansonsten direkt aus dem UID-Index und der
+        # rid->path-Zuordnung des Katalogs (ohne Brains)
+        catalog = hub['portal_catalog']._catalog
+        uid_index = catalog.getIndex('UID')._index
+        paths = catalog.paths
+        tables = valid_disk_tables(hub, info['request'])
+
+        def func(uids):
+            if tables is not None:
+                res = tables.get_many('uid2path', uids)
+                missing = [uid for uid in uids
+                           if uid not in res
+                           ]
+            else:
+                res = {}
+                missing = uids
+            for uid in missing:
+                rid = uid_index.get(uid)
+                if rid is None:
+                    res[uid] = None
+                    continue
+                if not isinstance(rid, int):  # FieldIndex: ein Set
+                    rid = rid.minKey()
+                res[uid] = paths.get(rid)
+            return res
+        return func
+
     def uid2fullpath_dict():
-        braindict = info['uid2brain']
+        fullpaths = info['_uids2paths']
 
         def func(uid):
-            try:
-                brain = braindict[uid]
-            except KeyError:
-                return None
-            else:
-                return brain.getPath()
-        return Proxy(func)
+            return fullpaths([uid])[uid]
+        return BulkProxy(func, fullpaths)
 
     def uid2path_dict():
-        braindict = info['uid2brain']
+        fullpaths = info['_uids2paths']
+        # der Pfad des Portals, das den Katalog enthält:
+        prefix = '/'.join(hub['portal_catalog'].getPhysicalPath()[:-1])
+        prefix_len = len(prefix)
+
+        def strip_root(path):
+            if path.startswith(prefix) and path[prefix_len:prefix_len+1] in (
+                    '/', ''):
+                return path[prefix_len:]
+            loclist = path.split('/')
+            del loclist[1]
+            return '/'.join(loclist)
+
+        def bulkfunc(uids):
+            res = fullpaths(uids)
+            for uid, path in res.items():
+                if path is not None:
+                    res[uid] = strip_root(path)
+            return res
 
         def func(uid):
-            try:
-                brain = braindict[uid]
-            except KeyError:
-                return None
-            else:
-                loclist = brain.getPath().split('/')
-                del loclist[1]
-                return '/'.join(loclist)
-        return Proxy(func)
+            return bulkfunc([uid])[uid]
+        return BulkProxy(func, bulkfunc)
 
-    def uid2url_dict():
+    def uid2groups_dict():
+        # UID --> zusammenarbeitende Gruppen; .many: eine Katalogabfrage
         catalog = hub['portal_catalog']
-        unrestrictedSearchResults = catalog.unrestrictedSearchResults
-
-        def func(uuid):
-            res = unrestrictedSearchResults(UID=uuid)
-            if res:
-                url = res[0].getURL()
-                pp(uuid=uuid, res=res, url=url)
-                return url
-        return Proxy(func)
+
+        def bulkfunc(uids):
+            return groups_by_uid(catalog, uids)
+
+        def func(uid):
+            return bulkfunc([uid])[uid]
+        return BulkProxy(func, bulkfunc)
+
+    def uid2url_dict():
+        # ohne Brains; URLs aus dem URL-Cache des Requests (--> .urls)
+        fullpaths = info['_uids2paths']
+        urls = request_urls(info['request'])
+
+        def bulkfunc(uids):
+            res = fullpaths(uids)
+            for uid, path in res.items():
+                if path is not None:
+                    res[uid] = urls.url(path)
+            return res
+
+        def func(uid):
+            return bulkfunc([uid])[uid]
+        return BulkProxy(func, bulkfunc)
 
     def dict_of_counters():
         return defaultdict(Counter)
@@ -739,6 +958,15 @@ def make_hubs(context, debug=False):
                                 o = None
             return o
 
+        tables = valid_disk_tables(hub, info['request'])
+        if lang is not None and tables is not None:
+            # ggf. aus dem Plattencache (--> .diskcache):
+            func = disk_translations(func, tables, lang,
+                                     info['portal_object'],
+                                     info['_uids2paths'])
+        if lang is not None and info['identity'].anonymous:
+            # für anonyme Benutzer prozeßweit gecacht (--> .translations):
+            func = cached_translations(func, lang, info['portal_object'])
         return Proxy(func, normalize=sorted_nonempty_item_tuples)
 
     FUNCMAP = {  # Objektinformationen:
@@ -752,6 +980,7 @@ def make_hubs(context, debug=False):
                'context_title': detect_context_title,
                'context_owner': detect_context_owner,
 
+               'book_index': get_book_index,
                'st_num': get_structure_number,
                'isBook': detect_book,
                'isPresentation': detect_presentation,
@@ -759,19 +988,20 @@ def make_hubs(context, debug=False):
                'bracket_default': detect_bracket_default,
                'request': get_request,
                'request_var': get_form,
+               'request_vars': parse_request_vars,  # --> .requestvars
                'response': get_response,
-               'audit-mode': get_audit_mode,
                # UID auflösen:
                'uid2brain': uid2brain_dict,
                'uid2url': uid2url_dict,
                'uid2fullpath': uid2fullpath_dict,
                'uid2path': uid2path_dict,
+               'uid2groups': uid2groups_dict,
+               '_uids2paths': get_uids2paths,  # Funktion, für .many
                # ... in Dict:
                'my_translation': get_translated,
                # 'get_translation': get_translation_getter,
                # für Breadcrumbs:
                'gid': detect_group_id,
-               'group_id': managed_group_id,
                'group_title': detect_group_title,
                'managed_group_title': managed_group_title,
                'template_id': detect_template_id,
@@ -784,18 +1014,17 @@ def make_hubs(context, debug=False):
                'desktop_brain': detect_desktop_brain,
                'desktop_url': detect_desktop_url,
                'has_uid': detect_has_uid,
-               'uid': requested_uid,
                'skip_desktop_crumbs': false_by_default,
                'personal_desktop_done': false_by_default,
                'group_desktop_done': false_by_default,
                'management_center_done': false_by_default,
+               'view_state': get_view_state,
                # Methoden von @@plone_context_state:
                'is_view_template': get_is_view_template,
                'view_url': get_view_url,
                'view_template_id': get_view_template_id,
                'view_template_done': false_by_default,
                # Exportprofil:
-               'export_profile_id': detect_export_profile_id,
                'export_profile': detect_export_profile,
                'export_profile_title': detect_export_profile_title,
                # für Druckausgabe von Bildern:
@@ -806,17 +1035,17 @@ def make_hubs(context, debug=False):
                # für Entwicklungsunterstützung:
                '_nesting_depth': gimme_0,
                '_context_printed': false_by_default,
-               # Tooltips erstmal nur auf Anforderung:
-               '_make_tooltip_divs': make_tooltip_divs,
                'has_perm': make_permission_proxy,
                # 'checked_permission': check_permission,
                # für ../browser/export/petrify.py:
-               'thread_ident': get_ident,
+               'thread_ident': get_thread_ident,
+               'request_clock': get_request_clock,
                'timestamp_fn': make_timestamp_fn,
                'path': detect_path,
                'current_lang': detect_current_language,
                'session': get_session_proxy,
                # Benutzerinformationen:
+               'identity': get_identity,
                'user_object': detect_user_object,
                'user_id': detect_user_id,
                'is_member_of': get_is_member_of,
@@ -835,26 +1064,164 @@ def make_hubs(context, debug=False):
                'counter': Counter,
                'counters': dict_of_counters,
                }
+    # aus dem Formular: 'audit-mode', '_make_tooltip_divs', 'uid',
+    # 'group_id' (im Management-Interface), 'export_profile_id' etc.:
+    for var in REQUEST_VARS:
+        FUNCMAP[var.name] = make_request_var_getter(attribute_name(var.name))
+
+    def get_provided(key):
+        factory, cache = info_providers[key]
+        if cache == PER_CONTEXT:
+            return factory(context, hub, info)
+        if cache == PER_REQUEST:
+            store = request_cache(info['request']).setdefault('provided', {})
+        else:
+            store = process_values()
+        try:
+            return store[key]
+        except KeyError:
+            return store.setdefault(key, factory(context, hub, info))
 
     class InfoHub(dict):
         """
         Puffere bestimmte Informationen über den Kontext
         """
+        # bei deklariertem Bedarf (--> .manifest.apply_manifest):
+        declared = None
+        undeclared = None
 
         def __getitem__(self, key):
             try:
                 return dict.__getitem__(self, key)
             except KeyError:
+                tracer = tracing.TRACER
                 if key in FUNCMAP:
-                    val = FUNCMAP[key]()
+                    if tracer is None:
+                        val = FUNCMAP[key]()
+                    else:
+                        span = tracer.start(key, 'FUNCMAP', 'info')
+                        try:
+                            val = FUNCMAP[key]()
+                        finally:
+                            tracer.finish(span)
+                elif key in info_providers:
+                    if tracer is None:
+                        val = get_provided(key)
+                    else:
+                        span = tracer.start(key, 'provider', 'info')
+                        try:
+                            val = get_provided(key)
+                        finally:
+                            tracer.finish(span)
                 else:
                     raise
                 dict.__setitem__(self, key, val)
+                if self.declared is not None and key not in self.declared:
+                    self.undeclared.add(key)
+                # wovon hängt die Ausgabe ab? (--> .variance)
+                request = getattr(context, 'REQUEST', None)
+                if request is not None:
+                    record_variance(request, key, val)
                 return dict.__getitem__(self, key)
 
-    info = InfoHub()
+    class TrackedInfoHub(InfoHub):
+        """
+        Ein InfoHub, der die Herkunft seiner Werte festhält
+        und "eingefroren" werden kann
+        """
+
+        def __init__(self):
+            InfoHub.__init__(self)
+            self._provenance = {}
+            self._overrides = set()
+            self._frozen = False
+
+        def __getitem__(self, key):
+            try:
+                return dict.__getitem__(self, key)
+            except KeyError:
+                val = InfoHub.__getitem__(self, key)
+                if FUNCMAP.get(key) in DEFAULT_FACTORIES:
+                    self._provenance[key] = DEFAULT
+                else:
+                    self._provenance[key] = COMPUTED
+                return val
+
+        def __setitem__(self, key, val):
+            if self._frozen:
+                raise ValueError("Can't add %r as %r: info is frozen"
+                                 % (val, key))
+            dict.__setitem__(self, key, val)
+            self._provenance[key] = INJECTED
+            if key in FUNCMAP:
+                self._overrides.add(key)
+
+        def _refuse(self, *args, **kwargs):
+            if self._frozen:
+                raise ValueError("Can't change info: it is frozen")
+
+        def __delitem__(self, key):
+            self._refuse()
+            dict.__delitem__(self, key)
+            self._provenance.pop(key, None)
+            self._overrides.discard(key)
+
+        def update(self, *args, **kwargs):
+            self._refuse()
+            for key, val in dict(*args, **kwargs).items():
+                self[key] = val
+
+        def setdefault(self, key, default=None):
+            if key not in self:
+                self[key] = default
+            return dict.__getitem__(self, key)
+
+        def pop(self, key, *args):
+            self._refuse()
+            self._provenance.pop(key, None)
+            self._overrides.discard(key)
+            return dict.pop(self, key, *args)
+
+        def popitem(self):
+            self._refuse()
+            key, val = dict.popitem(self)
+            self._provenance.pop(key, None)
+            self._overrides.discard(key)
+            return key, val
+
+        def clear(self):
+            self._refuse()
+            dict.clear(self)
+            self._provenance.clear()
+            self._overrides.clear()
+
+        def freeze(self):
+            # berechnete Werte werden weiterhin bei Bedarf ermittelt
+            self._frozen = True
+
+        def provenance(self, key):
+            return self._provenance.get(key)
+
+        def injected_overrides(self):
+            """
+            Die von außen gesetzten Schlüssel, für die es auch eine Funktion
+            gäbe (z. B. 'personal_desktop_done')
+            """
+            return sorted(self._overrides)
+
+    if tracked:
+        info = TrackedInfoHub()
+    else:
+        info = InfoHub()
     # Z. B. zum Andocken von .restrictedTraverse:
-    info['context'] = context
+    dict.__setitem__(info, 'context', context)
+    if tracked:
+        info._provenance['context'] = COMPUTED
     return hub, info
 # --------------------------------------- ] ... Tools- und Info-Hubs ]
 
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
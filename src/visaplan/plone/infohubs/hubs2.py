@@ -12,6 +12,7 @@ from six.moves import map
 
 # Local imports:
 from . import make_hubs
+from .manifest import apply_manifest
 
 __author__ = "Tobias Herp <tobias.herp@visaplan.com>"
 VERSION = (1,  # initial version
@@ -65,6 +66,9 @@ def context_tuple(hub=None, info=None, self=None,
     self -- üblicherweise übergeben, um daraus den Kontext zu ermitteln, der
             dann im Attribut `context` erwartet wird.
             Achtung -- dieses Attribut ist vermutlich nicht garantiert!
+            Deklariert self die benötigten Schlüssel (infohub_keys,
+            infohub_hub_keys), werden diese für neu erzeugte hub- und
+            info-Objekte vorab ermittelt (--> .manifest).
 
     Stets benannt zu übergeben:
 
@@ -95,6 +99,8 @@ def context_tuple(hub=None, info=None, self=None,
                                 ' self is needed!')
             context = self.context
         hub, info = make_hubs(context)
+        if self is not None:
+            apply_manifest(hub, info, self)
     else:
         if info is None:
             raise TypeError('hub given --> info expected as well')
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+The identity of the current user, shared by all hubs of a request
+
+The info keys logged_in, user_object, user_id, author_object and user_email
+are taken from one UserIdentity record per request; it is computed with a
+single portal_membership call (none for anonymous users) and at most one
+author lookup.
+
+>>> class User(object):
+...     def __init__(self, name):
+...         self.name = name
+...     def getUserName(self):
+...         return self.name
+...     def getId(self):
+...         return self.name
+>>> is_anonymous(User('Anonymous User')), is_anonymous(None)
+(True, True)
+>>> is_anonymous(User('joe'))
+False
+
+>>> class Author(object):
+...     def getEmail(self):
+...         return 'joe@example.com'
+>>> class Authors(object):
+...     calls = 0
+...     def getByUserId(self, uid):
+...         Authors.calls += 1
+...         return Author()
+>>> hub = {'author': Authors()}
+>>> joe = User('joe')
+>>> ident = UserIdentity(joe, joe, 'joe', False)
+>>> ident.user_email(hub), ident.author_object(hub) is not None
+('joe@example.com', True)
+>>> Authors.calls
+1
+>>> UserIdentity(None, None, None, True).user_email(hub)
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Zope:
+from AccessControl import getSecurityManager
+
+# Local imports:
+from .utils import request_cache
+
+__all__ = [
+        'UserIdentity',
+        'request_identity',  # hub, request --> UserIdentity
+        'is_anonymous',      # user --> bool
+        ]
+
+CACHE_KEY = 'identity'
+ANONYMOUS_USERNAME = 'Anonymous User'
+_UNKNOWN = object()
+
+
+def is_anonymous(user):
+    """
+    Like portal_membership.isAnonymousUser, for a given user object
+    """
+    return user is None or user.getUserName() == ANONYMOUS_USERNAME
+
+
+class UserIdentity(object):
+    """
+    User object, id and anonymity; author profile and email on demand
+    """
+
+    def __init__(self, user, user_object, user_id, anonymous):
+        self.user = user  # the unwrapped user, to detect changes
+        self.user_object = user_object
+        self.user_id = user_id
+        self.anonymous = anonymous
+        self._author = _UNKNOWN
+
+    def author_object(self, hub):
+        if self._author is _UNKNOWN:
+            if self.user_id is None:
+                self._author = None
+            else:
+                self._author = hub['author'].getByUserId(self.user_id)
+        return self._author
+
+    def user_email(self, hub):
+        author = self.author_object(hub)
+        if author is not None:
+            return author.getEmail()
+        return None
+
+
+def request_identity(hub, request):
+    """
+    Return the identity record of the request, creating it if necessary
+    (or if the authenticated user has changed, e.g. by logging in)
+    """
+    user = getSecurityManager().getUser()
+    cache = request_cache(request)
+    identity = cache.get(CACHE_KEY)
+    if identity is not None and identity.user is user:
+        return identity
+    if is_anonymous(user):
+        identity = UserIdentity(user, None, None, True)
+    else:
+        member = hub['portal_membership'].wrapUser(user)
+        identity = UserIdentity(user, member, member.getId(), False)
+    cache[CACHE_KEY] = identity
+    return identity
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Lazily imported optional integrations
+
+Several info keys depend on modules of optional (and rather heavy) packages,
+e.g. visaplan.plone.groups or visaplan.plone.pdfexport.  Those modules are
+imported on first use; the first request in each worker process used to pay
+the import cost silently.
+
+The integrations are registered here by name; the time needed to import
+(and, optionally, initialize) each of them is recorded:
+
+>>> register_integration('join', 'os.path:join')
+>>> integration_timings()['join']['loaded']
+False
+>>> integration('join')('a', 'b') == 'a' + __import__('os').sep + 'b'
+True
+>>> timing = integration_timings()['join']
+>>> timing['loaded'], timing['source'], timing['error']
+(True, 'lazy', None)
+>>> timing['import_seconds'] >= 0
+True
+
+Unknown names are refused:
+
+>>> integration('no_such_thing')
+Traceback (most recent call last):
+  ...
+KeyError: 'no_such_thing'
+
+The warm-up function imports all registered integrations ahead of time;
+missing optional packages are recorded but don't stop the warm-up:
+
+>>> register_integration('missing', 'visaplan.no.such.package:thing')
+>>> res = warmup_integrations(['join', 'missing'])
+>>> res['join']['source']
+'lazy'
+>>> res['missing']['loaded'], res['missing']['error'] is not None
+(False, True)
+>>> unregister_integration('join')
+>>> unregister_integration('missing')
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from importlib import import_module
+from threading import Lock
+from timeit import default_timer
+
+# Local imports:
+from .config import config_flag
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'register_integration',    # name, dotted [, init]
+        'unregister_integration',  # name
+        'integration',             # name --> imported (initialized) object
+        'integration_timings',     # --> dict of dicts
+        'warmup_integrations',     # [names] --> dict of dicts
+        'warmup_on_startup',       # subscriber for IProcessStarting
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+
+class LazyIntegration(object):
+    """
+    A named object from an optional package, imported on first use
+    """
+
+    def __init__(self, name, dotted, init=None):
+        """
+        name -- the name used to ask for the object
+        dotted -- 'package.module:attribute'
+        init -- an optional function to be called with the imported object;
+                its return value (if not None) replaces it
+        """
+        modname, attr = dotted.split(':')
+        self.name = name
+        self.dotted = dotted
+        self._modname = modname
+        self._attr = attr
+        self._init = init
+        self._lock = Lock()
+        self.loaded = False
+        self.value = None
+        self.source = None
+        self.error = None
+        self.import_seconds = None
+        self.init_seconds = None
+
+    def get(self, source='lazy'):
+        if self.loaded:
+            return self.value
+        with self._lock:
+            if not self.loaded:
+                self._load(source)
+        return self.value
+
+    def _load(self, source):
+        started = default_timer()
+        try:
+            val = getattr(import_module(self._modname), self._attr)
+        except (ImportError, AttributeError) as e:
+            self.error = '%s: %s' % (e.__class__.__name__, e)
+            raise
+        finally:
+            self.import_seconds = default_timer() - started
+        if self._init is not None:
+            started = default_timer()
+            try:
+                initialized = self._init(val)
+            finally:
+                self.init_seconds = default_timer() - started
+            if initialized is not None:
+                val = initialized
+        self.value = val
+        self.source = source
+        self.error = None
+        self.loaded = True
+        logger.info('integration %r (%s) loaded in %.3f s (%s)',
+                    self.name, self.dotted, self.import_seconds, source)
+
+    def timing(self):
+        return {'dotted': self.dotted,
+                'loaded': self.loaded,
+                'source': self.source,
+                'error': self.error,
+                'import_seconds': self.import_seconds,
+                'init_seconds': self.init_seconds,
+                }
+
+
+# ------------------------------------------------ [ Registry ... [
+INTEGRATIONS = {}
+
+
+def register_integration(name, dotted, init=None):
+    """
+    Register an optional integration; see LazyIntegration.__init__
+    """
+    INTEGRATIONS[name] = LazyIntegration(name, dotted, init)
+
+
+def unregister_integration(name):
+    del INTEGRATIONS[name]
+
+
+def integration(name):
+    """
+    Return the (imported) object registered by the given name
+    """
+    return INTEGRATIONS[name].get()
+
+
+def integration_timings():
+    """
+    Return the recorded import and initialization times per integration
+    """
+    return dict([(name, lazy.timing())
+                 for name, lazy in INTEGRATIONS.items()
+                 ])
+
+
+def warmup_integrations(names=None):
+    """
+    Import (and initialize) the given (by default: all) integrations now,
+    rather than during the first request which needs them.
+
+    Return the timings of the processed integrations.
+    """
+    if names is None:
+        names = sorted(INTEGRATIONS.keys())
+    res = {}
+    for name in names:
+        lazy = INTEGRATIONS[name]
+        try:
+            lazy.get(source='warmup')
+        except (ImportError, AttributeError) as e:
+            logger.info('integration %r not available: %s', name, e)
+        res[name] = lazy.timing()
+    return res
+
+
+def warmup_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting;
+    active if the warmup-integrations option is switched on
+    """
+    if config_flag('warmup-integrations'):
+        warmup_integrations()
+
+
+for args in [
+    # unitracctool:
+    ('FEATURESINFO',
+     'visaplan.plone.unitracctool.unitraccfeature.browser:FEATURESINFO'),
+    ('MYUNITRACC_UID',
+     'visaplan.plone.unitracctool.unitraccfeature.utils:MYUNITRACC_UID'),
+    # groups:
+    ('groupinfo_factory',
+     'visaplan.plone.groups.groupsharing.browser:groupinfo_factory'),
+    ('is_member_of__factory',
+     'visaplan.plone.groups.groupsharing.browser:is_member_of__factory'),
+    # pdfexport:
+    ('PDFCreator',
+     'visaplan.plone.pdfexport.creator:PDFCreator'),
+    ]:
+    register_integration(*args)
+# ------------------------------------------------ ] ... Registry ]
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Interfaces of visaplan.plone.infohubs
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Zope:
+from zope.interface import Attribute, Interface
+
+
+class IInfoKeyProvider(Interface):
+    """
+    A named utility which provides the info key of the same name
+    """
+
+    cache = Attribute("How long the value is kept: 'context' (the default;"
+                      " in the info dict), 'request' (shared by all hubs"
+                      " of the request) or 'process'")
+
+    def __call__(context, hub, info):
+        """
+        Compute the value for the given context
+        """
+
+
+class IHubResolver(Interface):
+    """
+    A named utility which provides the hub key of the same name
+    """
+
+    def __call__(context, name):
+        """
+        Return the tool, browser etc. for the given context
+        """
+
+
+class IExportProfileSavedEvent(Interface):
+    """
+    An export profile was saved (or deleted); cached copies are outdated
+    """
+
+    pid = Attribute('The id of the export profile')
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Hub manifests: pre-resolution of the keys a view is going to use
+
+Views (and other classes) can declare the info and hub keys they need:
+
+    class MyView(BrowserView):
+        infohub_keys = ('user_id', 'gid', 'context_title')
+        infohub_hub_keys = ('portal_catalog',)
+
+When hub and info are created for such a view (by @@hubandinfo/get or
+hubs2.context_tuple), the declared keys are resolved before rendering
+starts, in an order which lets them share their prerequisites (tools first,
+then the request, the context, the user; the remaining keys as declared).
+
+The keys are resolved one at a time; there is no batching of catalog
+queries here, since a manifest covers the keys of a single context (which
+need one catalog query at most, for context_as_brain).  Bulk access to
+other objects is provided by the .many methods of the uid2... info keys.
+
+Keys which are resolved later, i.e. which were used but not declared, are
+recorded and logged at the end of the request; see undeclared_report().
+
+>>> order_info_keys(['gid', 'my_uid', 'request_var', 'user_id', 'foo'])
+['request_var', 'my_uid', 'user_id', 'gid', 'foo']
+>>> order_hub_keys(['book', 'pc', 'portal_catalog', 'structuretype'])
+['pc', 'portal_catalog', 'book', 'structuretype']
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six import string_types as six_string_types
+
+# Standard library:
+from collections import Counter
+from threading import Lock
+
+# Local imports:
+from .hubs import NAMED_ADAPTERS, looksLikeATool
+from .utils import request_cache
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'order_info_keys',    # keys --> list
+        'order_hub_keys',     # keys --> list
+        'prefetch',           # hub, info, keys, hub_keys
+        'apply_manifest',     # hub, info, view
+        'report_undeclared',  # subscriber for IPubEnd
+        'undeclared_report',  # --> {(view, 'info'|'hub', key): count}
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+# basic info keys, to be resolved first (in this order):
+INFO_KEY_ORDER = [
+    'request',
+    'request_var',
+    'request_vars',
+    'portal_type',
+    'my_uid',
+    'context_as_brain',
+    'identity',
+    'logged_in',
+    'user_object',
+    'user_id',
+    'author_object',
+    'session',
+    'cooperating_groups',
+    ]
+_INFO_RANK = dict([(key, rank)
+                   for rank, key in enumerate(INFO_KEY_ORDER)
+                   ])
+CACHE_KEY = 'manifests'
+_UNDECLARED = Counter()
+_LOCK = Lock()
+
+
+def order_info_keys(keys):
+    """
+    Return the keys in resolution order: basic keys first
+    """
+    last = len(INFO_KEY_ORDER)
+    ranked = [(_INFO_RANK.get(key, last), i, key)
+              for i, key in enumerate(keys)
+              ]
+    return [tup[2] for tup in sorted(ranked)]
+
+
+def order_hub_keys(keys):
+    """
+    Return the hub keys in resolution order: tools (and abbreviations of
+    tools) first, since browsers and views might need them
+    """
+    def is_tool(key):
+        val = NAMED_ADAPTERS.get(key, key)
+        return (isinstance(val, six_string_types)
+                and bool(looksLikeATool(val)))
+    ranked = [(not is_tool(key), i, key)
+              for i, key in enumerate(keys)
+              ]
+    return [tup[2] for tup in sorted(ranked)]
+
+
+def prefetch(hub, info, keys=(), hub_keys=()):
+    """
+    Resolve the given keys now
+    """
+    for key in order_hub_keys(hub_keys):
+        hub[key]
+    for key in order_info_keys(keys):
+        info[key]
+
+
+def apply_manifest(hub, info, view):
+    """
+    If the given view declares a manifest (infohub_keys, infohub_hub_keys),
+    resolve the declared keys and start recording undeclared ones
+    """
+    keys = tuple(getattr(view, 'infohub_keys', None) or ())
+    hub_keys = tuple(getattr(view, 'infohub_hub_keys', None) or ())
+    if not (keys or hub_keys):
+        return
+    prefetch(hub, info, keys, hub_keys)
+    info.undeclared = set()
+    hub.undeclared = set()
+    info.declared = frozenset(keys)
+    hub.declared = frozenset(hub_keys)
+    name = view.__class__.__name__
+    try:
+        request = info['request']
+    except (AttributeError, KeyError):
+        return
+    request_cache(request).setdefault(CACHE_KEY, []).append(
+            (name, hub, info))
+
+
+def report_undeclared(event):
+    """
+    Subscriber for ZPublisher.interfaces.IPubEnd:
+    log (and count) the keys which were used but not declared
+    """
+    manifests = request_cache(event.request).pop(CACHE_KEY, None)
+    for name, hub, info in manifests or []:
+        for kind, keys in (('info', info.undeclared),
+                           ('hub', hub.undeclared)):
+            if not keys:
+                continue
+            logger.info('%s: undeclared %s keys %s',
+                        name, kind, sorted(keys))
+            with _LOCK:
+                for key in keys:
+                    _UNDECLARED[(name, kind, key)] += 1
+
+
+def undeclared_report():
+    """
+    Return how often keys were used but not declared, per view class
+    """
+    with _LOCK:
+        return dict(_UNDECLARED)
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
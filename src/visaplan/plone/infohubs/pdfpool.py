@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+A process-level pool of PDFCreator objects, for info['PDFCreator']
+
+Creating a PDFCreator (from visaplan.plone.pdfexport) involves loading the
+licence data of the PDFreactor backend (set_key); for busy PDF export
+endpoints, this is done once per pool member.  Only the request-specific
+data (context and cookies) are bound at checkout; this requires the creator
+class to provide a `rebind` method.  Creator classes without it are not
+pooled (and don't count against the pool size) but still accounted for in
+the metrics.
+
+Note that the PDFCreator class of visaplan.plone.pdfexport 1.0 doesn't have
+a `rebind` method (its PDFreactor client accumulates cookies, scripts and
+stylesheets per export, so it can't be simply rebound); for this class, the
+pool currently provides the metrics only.
+
+>>> class Creator(object):
+...     keys_loaded = 0
+...     def __init__(self, dic):
+...         self.rebind(dic)
+...     def rebind(self, dic):
+...         self.context = dic['context']
+...     def set_key(self):
+...         Creator.keys_loaded += 1
+...     def setCookies(self):
+...         pass
+...     def start(self):
+...         return 'PDF for %s' % (self.context,)
+>>> pool = PDFCreatorPool(size=2, timeout=0, factory=Creator)
+>>> c1 = pool.checkout('ctx1', {})
+>>> c1.context
+'ctx1'
+>>> pool.checkin(c1)
+>>> c2 = pool.checkout('ctx2', {})
+>>> c2 is c1, c2.context, Creator.keys_loaded
+(True, 'ctx2', 1)
+
+The conversion time is measured for the calls of the `start` method only:
+
+>>> c2.start()
+'PDF for ctx2'
+>>> pool.metrics()['conversions']
+1
+
+If the pool is exhausted (and the timeout is over), temporary creators are
+created which are not returned to the pool:
+
+>>> c3 = pool.checkout('ctx3', {})
+>>> c4 = pool.checkout('ctx4', {})
+>>> c4.start()
+'PDF for ctx4'
+>>> for c in (c2, c3, c4):
+...     pool.checkin(c)
+>>> m = pool.metrics()
+>>> m['size'], m['created'], m['temporary'], m['idle'], m['in_use']
+(2, 2, 1, 2, 0)
+>>> m['checkouts'], m['conversions']
+(4, 2)
+
+A pooled creator is instrumented once only:
+
+>>> c5 = pool.checkout('ctx5', {})
+>>> c5.start()
+'PDF for ctx5'
+>>> pool.metrics()['conversions']
+3
+>>> pool.checkin(c5)
+
+A failing factory doesn't use up the pool:
+
+>>> class Broken(Creator):
+...     def set_key(self):
+...         raise ValueError('no licence')
+>>> pool = PDFCreatorPool(size=1, timeout=0, factory=Broken)
+>>> pool.checkout('ctx1', {})
+Traceback (most recent call last):
+  ...
+ValueError: no licence
+>>> pool.metrics()['created']
+0
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six.moves.queue import Empty, LifoQueue
+
+# Standard library:
+from functools import wraps
+from threading import Lock
+from timeit import default_timer
+
+# Local imports:
+from .config import product_config
+from .integrations import integration
+from .utils import request_cache
+
+__all__ = [
+        'PDFCreatorPool',
+        'checkout_pdfcreator',  # context, request --> creator
+        'checkin_pdfcreators',  # request (outside of publishing)
+        'release_pdfcreators',  # subscriber for IPubEnd and IPubFailure
+        'pdfcreator_metrics',   # --> dict
+        ]
+
+DEFAULT_SIZE = 4
+DEFAULT_TIMEOUT = 5.0  # seconds to wait for a pooled creator
+CACHE_KEY = 'pdfcreators'
+CONVERSION_METHOD = 'start'  # the method which creates the PDF
+# kinds of checked-out creators:
+POOLED = 'pooled'
+TEMPORARY = 'temporary'      # pool exhausted
+UNPOOLABLE = 'unpoolable'    # creator class lacks a rebind method
+
+
+def default_factory(dic):
+    return integration('PDFCreator')(dic)
+
+
+class PDFCreatorPool(object):
+    """
+    A pool of PDFCreator objects which have their licence data loaded
+    """
+
+    def __init__(self, size=None, timeout=None, factory=None):
+        if size is None:
+            size = int(product_config().get('pdfcreator-pool-size',
+                                            DEFAULT_SIZE))
+        if timeout is None:
+            timeout = float(product_config().get('pdfcreator-pool-timeout',
+                                                 DEFAULT_TIMEOUT))
+        self.size = size
+        self.timeout = timeout
+        self._factory = factory or default_factory
+        self._idle = LifoQueue()
+        self._lock = Lock()
+        self._created = 0
+        self._temporary = 0
+        self._unpoolable = False  # the factory creates unpoolable creators
+        self._checked_out = {}  # id(creator) --> kind
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._conversions = 0
+        self._conversion_total = 0.0
+        self._conversion_max = 0.0
+
+    def _create(self, context, cookies):
+        creator = self._factory({'context': context,
+                                 'cookie': cookies,
+                                 })
+        creator.set_key()
+        return creator
+
+    def _grow(self, context, cookies):
+        # the slot was reserved by the caller (self._created)
+        try:
+            creator = self._create(context, cookies)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        if hasattr(creator, 'rebind'):
+            return creator, POOLED
+        with self._lock:
+            # no use in waiting for the pool:
+            self._created -= 1
+            self._unpoolable = True
+        return creator, UNPOOLABLE
+
+    def checkout(self, context, cookies, wait=True):
+        """
+        Return a creator which is bound to the given context and cookies
+
+        If `wait` is false, a temporary creator is created right away
+        if there is no idle one (and the pool is fully grown).
+        """
+        started = default_timer()
+        kind = POOLED
+        creator = None
+        reused = False  # from the pool, to be rebound
+        if self._unpoolable:
+            kind = UNPOOLABLE
+            creator = self._create(context, cookies)
+        else:
+            try:
+                creator = self._idle.get_nowait()
+                reused = True
+            except Empty:
+                with self._lock:
+                    grow = self._created < self.size
+                    if grow:
+                        self._created += 1
+                if grow:
+                    creator, kind = self._grow(context, cookies)
+                elif wait and self.timeout:
+                    try:
+                        creator = self._idle.get(timeout=self.timeout)
+                        reused = True
+                    except Empty:
+                        pass
+                if creator is None:
+                    with self._lock:
+                        self._temporary += 1
+                    kind = TEMPORARY
+                    creator = self._create(context, cookies)
+            if reused:
+                creator.rebind({'context': context,
+                                'cookie': cookies,
+                                })
+        creator.setCookies()
+        self._instrument(creator)
+        now = default_timer()
+        waited = now - started
+        with self._lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+            self._checked_out[id(creator)] = kind
+        return creator
+
+    def _instrument(self, creator):
+        """
+        Measure the time of the conversion method calls of the creator
+        """
+        if CONVERSION_METHOD in vars(creator):
+            return  # a pooled creator, instrumented before
+        convert = getattr(creator, CONVERSION_METHOD, None)
+        if convert is None:
+            return
+
+        @wraps(convert)
+        def timed_conversion(*args, **kwargs):
+            started = default_timer()
+            try:
+                return convert(*args, **kwargs)
+            finally:
+                used = default_timer() - started
+                with self._lock:
+                    self._conversions += 1
+                    self._conversion_total += used
+                    if used > self._conversion_max:
+                        self._conversion_max = used
+        setattr(creator, CONVERSION_METHOD, timed_conversion)
+
+    def checkin(self, creator):
+        """
+        Give the creator back (pooled creators are returned to the pool)
+        """
+        with self._lock:
+            kind = self._checked_out.pop(id(creator), None)
+        if kind == POOLED:
+            self._idle.put(creator)
+
+    def metrics(self):
+        with self._lock:
+            in_use = len(self._checked_out)
+            return {'size': self.size,
+                    'created': self._created,
+                    'temporary': self._temporary,
+                    'idle': self._idle.qsize(),
+                    'in_use': in_use,
+                    'checkouts': self._checkouts,
+                    'wait_total': self._wait_total,
+                    'wait_max': self._wait_max,
+                    'conversions': self._conversions,
+                    'conversion_total': self._conversion_total,
+                    'conversion_max': self._conversion_max,
+                    }
+
+
+POOL = None
+_POOL_LOCK = Lock()
+
+
+def get_pool():
+    global POOL
+    if POOL is None:
+        with _POOL_LOCK:
+            if POOL is None:
+                POOL = PDFCreatorPool()
+    return POOL
+
+
+def checkout_pdfcreator(context, request):
+    """
+    Return a creator for the given context; it is given back at the end
+    of the request (see release_pdfcreators).
+
+    Every hub gets a creator of its own; if the request holds a creator
+    already (e.g. during a bulk export which creates a hub per item),
+    it doesn't wait for the pool but gets a temporary creator if no
+    pooled one is idle, to avoid deadlocking on its own creators.
+    """
+    creators = request_cache(request).setdefault(CACHE_KEY, [])
+    creator = get_pool().checkout(context, request.cookies,
+                                  wait=not creators)
+    creators.append(creator)
+    return creator
+
+
+def checkin_pdfcreators(request):
+    """
+    Give the creators which were used during the request back to the pool;
+    to be called by scripts (and others which don't publish the request)
+    """
+    if POOL is None:
+        return
+    creators = request_cache(request).pop(CACHE_KEY, None)
+    for creator in creators or []:
+        POOL.checkin(creator)
+
+
+def release_pdfcreators(event):
+    """
+    Subscriber for ZPublisher.interfaces.IPubEnd (and IPubFailure):
+    give the creators which were used during the request back to the pool
+    """
+    checkin_pdfcreators(event.request)
+
+
+def pdfcreator_metrics():
+    """
+    Return the metrics of the process-level pool
+    """
+    return get_pool().metrics()
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Process-level cache of export profiles
+
+info['export_profile'] and info['export_profile_title'] used to load the
+same profile twice, in every hub of every export request.  Now the profile
+is loaded once per process (and site) and serves both keys.
+
+The code which saves a profile should notify an ExportProfileSaved event;
+the cached copy of the saving process is forgotten then.  Since other worker
+processes might have changed it, a profile is reloaded after
+export-profile-ttl seconds (default: 300) as well.
+
+>>> class Export(object):
+...     loads = 0
+...     def getRawProfile(self, pid):
+...         Export.loads += 1
+...         return {'title': 'Profile %s' % pid, 'formats': ['pdf']}
+...     def getProfileTitle(self, pid):
+...         Export.loads += 1
+...         return 'Profile %s' % pid
+>>> hub = {'export': Export()}
+>>> profile = export_profile(hub, 3)
+>>> profile['formats'].append('html')  # changes our copy only
+>>> export_profile(hub, 3)
+{'title': 'Profile 3', 'formats': ['pdf']}
+>>> export_profile_title(hub, 3)
+'Profile 3'
+>>> export_profile_title(hub, 3)
+'Profile 3'
+>>> Export.loads
+2
+>>> profile_saved(ExportProfileSaved(3))
+>>> export_profile_title(hub, 3)
+'Profile 3'
+>>> Export.loads
+4
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from copy import deepcopy
+from threading import Lock
+from time import time
+
+# Zope:
+from zope.interface import implementer
+
+# Local imports:
+from .config import product_config
+from .interfaces import IExportProfileSavedEvent
+from .utils import site_key
+
+__all__ = [
+        'export_profile',        # hub, pid --> raw profile (a copy)
+        'export_profile_title',  # hub, pid --> title
+        'invalidate_export_profiles',  # [pid]
+        'ExportProfileSaved',    # event: pid
+        'profile_saved',         # subscriber for IExportProfileSavedEvent
+        ]
+
+DEFAULT_TTL = 300
+_UNKNOWN = object()
+_CACHE = {}  # (site key, pid) --> ProfileEntry
+_LOCK = Lock()
+
+
+class ProfileEntry(object):
+    """
+    The raw profile, its loading time and its title
+    """
+
+    def __init__(self, raw, loaded):
+        self.raw = raw
+        self.loaded = loaded
+        self.title = _UNKNOWN
+
+
+@implementer(IExportProfileSavedEvent)
+class ExportProfileSaved(object):
+
+    def __init__(self, pid):
+        self.pid = pid
+
+
+def _ttl():
+    try:
+        return float(product_config().get('export-profile-ttl',
+                                          DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def _entry(hub, pid):
+    key = (site_key(), pid)
+    entry = _CACHE.get(key)
+    if entry is not None and time() - entry.loaded < _ttl():
+        return entry
+    entry = ProfileEntry(hub['export'].getRawProfile(pid), time())
+    with _LOCK:
+        _CACHE[key] = entry
+    return entry
+
+
+def export_profile(hub, pid):
+    """
+    Return (a copy of) the raw export profile
+    """
+    return deepcopy(_entry(hub, pid).raw)
+
+
+def export_profile_title(hub, pid):
+    """
+    Return the title of the export profile (asked for once)
+    """
+    entry = _entry(hub, pid)
+    if entry.title is _UNKNOWN:
+        entry.title = hub['export'].getProfileTitle(pid)
+    return entry.title
+
+
+def invalidate_export_profiles(pid=None):
+    """
+    Forget the given cached profile (by default: all of them)
+    """
+    with _LOCK:
+        if pid is None:
+            _CACHE.clear()
+        else:
+            for key in list(_CACHE):
+                if key[1] == pid:
+                    del _CACHE[key]
+
+
+def profile_saved(event):
+    """
+    Subscriber for IExportProfileSavedEvent
+    """
+    invalidate_export_profiles(event.pid)
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Pluggable providers for info keys and resolvers for hub keys
+
+Add-on packages can contribute info and hub keys without patching this
+package:
+
+- by calling register_info_provider or register_hub_resolver,
+- by registering named utilities (IInfoKeyProvider, IHubResolver), which
+  may be local to a site, or
+- by declaring entry points in the groups
+  visaplan.plone.infohubs.providers and visaplan.plone.infohubs.resolvers.
+
+An info key provider is called with (context, hub, info); its `cache`
+attribute (or the value given to register_info_provider) tells how long the
+value is kept:
+
+context -- in the info dict, like the built-in keys (the default)
+request -- shared by all hubs created during the request
+process -- computed once per process (and site)
+
+A hub resolver is called with (context, name).
+
+All sources are compiled into flat dispatch tables per site; thus, the
+number of providers doesn't influence the lookup cost.  The built-in keys
+of make_hubs (info keys, and the named hub keys like 'pc') take precedence;
+hub resolvers take precedence over the generic naming rules for views,
+tools and browsers only.
+
+>>> def answer(context, hub, info):
+...     return 42
+>>> register_info_provider('answer', answer, 'process')
+>>> infos, hubs = compile_providers()
+>>> infos['answer'] == (answer, 'process')
+True
+>>> unregister_info_provider('answer')
+
+>>> register_info_provider('answer', answer, 'forever')
+Traceback (most recent call last):
+  ...
+ValueError: Unsupported cache scope: 'forever'
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Setup tools:
+import pkg_resources
+
+# Standard library:
+from threading import Lock
+
+# Zope:
+from zope.component import getUtilitiesFor
+
+# Local imports:
+from .interfaces import IHubResolver, IInfoKeyProvider
+from .utils import site_key
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'register_info_provider',    # name, factory [, cache]
+        'unregister_info_provider',  # name
+        'register_hub_resolver',     # name, resolver
+        'unregister_hub_resolver',   # name
+        'compile_providers',         # --> (info table, hub table)
+        'dispatch_tables',           # --> (info table, hub table), cached
+        'process_values',            # --> dict, per site
+        'invalidate_providers',      # subscriber for registration events
+        'PER_CONTEXT',
+        'PER_REQUEST',
+        'PER_PROCESS',
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+PER_CONTEXT = 'context'
+PER_REQUEST = 'request'
+PER_PROCESS = 'process'
+SCOPES = frozenset([PER_CONTEXT, PER_REQUEST, PER_PROCESS])
+
+INFO_GROUP = 'visaplan.plone.infohubs.providers'
+HUB_GROUP = 'visaplan.plone.infohubs.resolvers'
+
+INFO_PROVIDERS = {}  # name --> (factory, cache)
+HUB_RESOLVERS = {}   # name --> resolver
+_ENTRY_POINTS = {}   # group --> dict
+_COMPILED = {}       # site key --> (info table, hub table)
+_PROCESS_VALUES = {}  # site key --> dict
+_LOCK = Lock()
+
+
+def _checked_scope(cache):
+    if cache not in SCOPES:
+        raise ValueError('Unsupported cache scope: %(cache)r' % locals())
+    return cache
+
+
+def register_info_provider(name, factory, cache=PER_CONTEXT):
+    INFO_PROVIDERS[name] = (factory, _checked_scope(cache))
+    invalidate_providers()
+
+
+def unregister_info_provider(name):
+    del INFO_PROVIDERS[name]
+    invalidate_providers()
+
+
+def register_hub_resolver(name, resolver):
+    HUB_RESOLVERS[name] = resolver
+    invalidate_providers()
+
+
+def unregister_hub_resolver(name):
+    del HUB_RESOLVERS[name]
+    invalidate_providers()
+
+
+def _entry_points(group):
+    try:
+        return _ENTRY_POINTS[group]
+    except KeyError:
+        pass
+    res = {}
+    for ep in pkg_resources.iter_entry_points(group):
+        try:
+            res[ep.name] = ep.load()
+        except ImportError as e:
+            logger.error('%s: entry point %r not loaded (%s)',
+                         group, ep.name, e)
+    _ENTRY_POINTS[group] = res
+    return res
+
+
+def compile_providers():
+    """
+    Collect the providers and resolvers for the current site;
+    named utilities override explicit registrations,
+    which in turn override entry points.
+    """
+    infos = {}
+    for name, factory in _entry_points(INFO_GROUP).items():
+        infos[name] = (factory,
+                       _checked_scope(getattr(factory, 'cache', PER_CONTEXT)))
+    infos.update(INFO_PROVIDERS)
+    for name, util in getUtilitiesFor(IInfoKeyProvider):
+        infos[name] = (util,
+                       _checked_scope(getattr(util, 'cache', PER_CONTEXT)))
+
+    hubs = dict(_entry_points(HUB_GROUP))
+    hubs.update(HUB_RESOLVERS)
+    for name, util in getUtilitiesFor(IHubResolver):
+        hubs[name] = util
+    return infos, hubs
+
+
+def dispatch_tables():
+    """
+    Return the compiled (info table, hub table) for the current site
+    """
+    key = site_key()
+    try:
+        return _COMPILED[key]
+    except KeyError:
+        pass
+    with _LOCK:
+        if key not in _COMPILED:
+            _COMPILED[key] = compile_providers()
+        return _COMPILED[key]
+
+
+def process_values():
+    """
+    Return the dict which holds the values of providers with process scope
+    for the current site
+    """
+    key = site_key()
+    try:
+        return _PROCESS_VALUES[key]
+    except KeyError:
+        return _PROCESS_VALUES.setdefault(key, {})
+
+
+def invalidate_providers(event=None):
+    """
+    Forget the compiled dispatch tables (and the values of process scope);
+    subscriber for registration events
+    """
+    with _LOCK:
+        _COMPILED.clear()
+        _PROCESS_VALUES.clear()
+
+
+def compile_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting
+    """
+    dispatch_tables()
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
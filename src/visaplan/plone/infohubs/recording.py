@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Recording of hub and info key resolution, for offline replay
+
+In recording mode, a Recorder (a special Tracer, see .tracing) collects for
+each request the cold resolutions of hub[...] and info[...] keys (with
+their timing) and the calls to the values of the hub (tools, browsers,
+functions), with arguments, results and timing.  At the end of the request,
+the trace is appended to a file, one JSON object per line; see .replay
+for the offline analysis.
+
+>>> recorder = Recorder()
+>>> class Catalog(object):
+...     def getCounter(self):
+...         return 42
+>>> span = recorder.start('portal_catalog', 'tool', 'hub')
+>>> recorder.finish(span)
+>>> catalog = recorder.wrap('portal_catalog', Catalog())
+>>> catalog.getCounter()
+42
+>>> trace = recorder.pop_trace()
+>>> [(ev['type'], ev['key']) for ev in trace['events']]
+[('span', 'portal_catalog'), ('call', 'portal_catalog')]
+>>> trace['events'][0]['start'] >= 0
+True
+>>> call = trace['events'][1]
+>>> call['method'], call['args'], call['result']
+('getCounter', '()', 42)
+
+Plain data (strings, numbers, lists, tuples, dicts ...) is not wrapped;
+other values get a proxy which supports container access as well:
+
+>>> names = ['portal_catalog', 'portal_url']
+>>> recorder.wrap('names', names) is names
+True
+>>> class Folder(object):
+...     def __init__(self):
+...         self.ids = ['a', 'b']
+...     def __getitem__(self, key):
+...         return key.upper()
+...     def __iter__(self):
+...         return iter(self.ids)
+...     def __len__(self):
+...         return len(self.ids)
+...     def __contains__(self, key):
+...         return key in self.ids
+>>> folder = recorder.wrap('folder', Folder())
+>>> list(folder), len(folder), 'a' in folder, bool(folder), folder['a']
+(['a', 'b'], 2, True, True, 'A')
+>>> [(ev['key'], ev['method']) for ev in recorder.pop_trace()['events']]
+[('folder', '__getitem__')]
+
+Values which can't be expressed in JSON are recorded by their repr:
+
+>>> jsonable([1, 'two', {'three': 3}])
+[1, 'two', {'three': 3}]
+>>> jsonable(Catalog())['repr'].startswith('<')
+True
+
+Recording is switched on by the product configuration:
+
+    <product-config visaplan.plone.infohubs>
+        recording-file /path/to/var/log/infohubs-traces.jsonl
+    </product-config>
+
+Since the hub values are wrapped by recording proxies, this mode is meant
+for test instances (or for short periods).
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six import string_types as six_string_types
+from six.moves._thread import get_ident
+
+# Standard library:
+import json
+from threading import Lock
+from time import time
+from timeit import default_timer
+
+# Local imports:
+from . import tracing
+from .config import product_config
+
+__all__ = [
+        'Recorder',
+        'RecordingProxy',
+        'jsonable',                # value --> JSON-compatible value
+        'start_recording',         # [filename] --> Recorder
+        'stop_recording',
+        'recording_on_startup',    # subscriber for IProcessStarting
+        'recording_request_end',   # subscriber for IPubEnd
+        ]
+
+SIMPLE_TYPES = six_string_types + (bool, int, float, type(None))
+# not wrapped by recording proxies:
+PLAIN_TYPES = SIMPLE_TYPES + (list, tuple, dict, set, frozenset)
+MAX_REPR = 200
+
+
+def jsonable(val, depth=3):
+    """
+    Return the value, if it can be expressed in JSON (with limited depth),
+    or a dict containing its (shortened) repr
+    """
+    if isinstance(val, SIMPLE_TYPES):
+        return val
+    if depth:
+        if isinstance(val, (list, tuple)):
+            return [jsonable(item, depth-1) for item in val]
+        if isinstance(val, dict):
+            if all([isinstance(key, six_string_types) for key in val]):
+                return dict([(key, jsonable(item, depth-1))
+                             for key, item in val.items()
+                             ])
+    return {'repr': repr(val)[:MAX_REPR]}
+
+
+class RecordingProxy(object):
+    """
+    Wraps a hub value and records the calls of its methods
+    (and of the value itself, if it is a function)
+    """
+
+    def __init__(self, key, obj, recorder):
+        self.__dict__['_key'] = key
+        self.__dict__['_obj'] = obj
+        self.__dict__['_recorder'] = recorder
+
+    def __getattr__(self, name):
+        val = getattr(self._obj, name)
+        if name.startswith('_') or not callable(val):
+            return val
+        return self._recorder.recording_method(self._key, name, val)
+
+    def __setattr__(self, name, val):
+        setattr(self._obj, name, val)
+
+    def __call__(self, *args, **kwargs):
+        return self._recorder.recording_method(self._key, '__call__',
+                                               self._obj)(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self._recorder.recording_method(self._key, '__getitem__',
+                                               self._obj.__getitem__)(key)
+
+    def __iter__(self):
+        return iter(self._obj)
+
+    def __len__(self):
+        return len(self._obj)
+
+    def __contains__(self, key):
+        return key in self._obj
+
+    def __bool__(self):
+        return bool(self._obj)
+    __nonzero__ = __bool__  # Python 2
+
+    def __repr__(self):
+        return '<recording %r>' % (self._obj,)
+
+
+class Recorder(tracing.Tracer):
+    """
+    A tracer which collects the spans and calls of each request thread
+    """
+
+    def __init__(self, filename=None):
+        tracing.Tracer.__init__(self, self)  # we are our own exporter
+        self.filename = filename
+        self._traces = {}  # thread ident --> trace dict
+        self._lock = Lock()
+
+    def _trace(self):
+        ident = get_ident()
+        trace = self._traces.get(ident)
+        if trace is None:
+            trace = self._traces[ident] = {'start_time': time(),
+                                           'events': [],
+                                           }
+        return trace
+
+    def _add(self, event):
+        trace = self._trace()
+        event['start'] -= trace['start_time']
+        trace['events'].append(event)
+
+    def start(self, key, kind, hubtype):
+        self._trace()  # the trace starts with its first span
+        return tracing.Tracer.start(self, key, kind, hubtype)
+
+    def export(self, span):
+        attributes = span['attributes']
+        self._add({'type': 'span',
+                   'hub': attributes['infohubs.hub'],
+                   'key': attributes['infohubs.key'],
+                   'kind': attributes['infohubs.kind'],
+                   'parent': attributes['infohubs.parent'],
+                   'start': span['start_time'],
+                   'duration': span['duration'],
+                   })
+
+    def wrap(self, key, val):
+        if isinstance(val, PLAIN_TYPES):
+            return val
+        return RecordingProxy(key, val, self)
+
+    def recording_method(self, key, name, method):
+        def recorded(*args, **kwargs):
+            start = time()
+            started = default_timer()
+            result = method(*args, **kwargs)
+            self._add({'type': 'call',
+                       'key': key,
+                       'method': name,
+                       'args': call_signature(args, kwargs),
+                       'result': jsonable(result),
+                       'start': start,
+                       'duration': default_timer() - started,
+                       })
+            return result
+        return recorded
+
+    def pop_trace(self, request=None):
+        """
+        Return (and forget) the trace of the current thread
+        """
+        trace = self._traces.pop(get_ident(), None)
+        if trace is None:
+            return None
+        if request is not None:
+            trace['url'] = request.get('ACTUAL_URL')
+            trace['form'] = jsonable(dict(request.form))
+        return trace
+
+    def write(self, trace):
+        line = json.dumps(trace, sort_keys=True) + '\n'
+        with self._lock:
+            with open(self.filename, 'a') as fo:
+                fo.write(line)
+
+
+def call_signature(args, kwargs):
+    """
+    Return a string which identifies the arguments of a call
+
+    >>> call_signature(('abc',), {'b': 2, 'a': 1})
+    "('abc',), a=1, b=2"
+    """
+    res = [repr(tuple(args))]
+    for key in sorted(kwargs):
+        res.append('%s=%r' % (key, kwargs[key]))
+    return ', '.join(res)
+
+
+def start_recording(filename):
+    recorder = Recorder(filename)
+    tracing.TRACER = recorder
+    return recorder
+
+
+def stop_recording():
+    if isinstance(tracing.TRACER, Recorder):
+        tracing.TRACER = None
+
+
+def recording_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting:
+    start recording if the recording-file option is given
+    """
+    filename = product_config().get('recording-file')
+    if filename:
+        start_recording(filename)
+
+
+def recording_request_end(event):
+    """
+    Subscriber for ZPublisher.interfaces.IPubEnd:
+    write the trace of the request
+    """
+    recorder = tracing.TRACER
+    if not isinstance(recorder, Recorder):
+        return
+    trace = recorder.pop_trace(event.request)
+    if trace is not None and recorder.filename:
+        recorder.write(trace)
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
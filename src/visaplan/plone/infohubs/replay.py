@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Offline analysis and replay of recorded traces (see .recording)
+
+analyze(traces) reports for each key, as recorded: how often it was
+resolved, how many of these resolutions were duplicates (the same key
+resolved again during the same request, i.e. by another hub), and the time
+spent (inclusive of the keys resolved on its behalf):
+
+>>> trace = {'events': [
+...     {'type': 'span', 'hub': 'hub', 'key': 'portal_catalog',
+...      'kind': 'tool', 'parent': 'my_uid', 'start': 0.001,
+...      'duration': 0.002},
+...     {'type': 'span', 'hub': 'info', 'key': 'my_uid',
+...      'kind': 'FUNCMAP', 'parent': None, 'start': 0.0, 'duration': 0.01},
+...     {'type': 'span', 'hub': 'info', 'key': 'my_uid',
+...      'kind': 'FUNCMAP', 'parent': None, 'start': 0.02, 'duration': 0.01},
+...     ]}
+>>> report = analyze([trace])
+>>> report[('info', 'my_uid')]
+{'count': 2, 'duplicates': 1, 'seconds': 0.02}
+>>> print(format_report(report))
+key                                         count   dupl    seconds
+info[my_uid]                                    2      1     0.0200
+hub[portal_catalog]                             1      0     0.0020
+
+replay(traces) runs the outermost info keys of each trace again, with the
+code at hand, in a stub context whose hub contains stub tools; these
+answer the recorded calls with the recorded results (or with Stub objects,
+for results which couldn't be recorded), optionally taking the recorded
+time.  The result is reported in the same way, to be compared with the
+recorded one.  No Plone site is needed; from the command line:
+
+    python -m visaplan.plone.infohubs.replay traces.jsonl [--simulate]
+
+>>> tool = StubTool('pm', [{'type': 'call', 'key': 'pm', 'method': 'getId',
+...                         'args': '()', 'result': 'joe', 'duration': 0}])
+>>> tool.getId(), tool.getId(), bool(tool.getOther())
+('joe', 'joe', False)
+"""
+
+# Python compatibility:
+from __future__ import absolute_import, print_function
+
+# Standard library:
+import json
+import sys
+from collections import defaultdict
+from time import sleep
+
+# Local imports:
+from . import tracing
+from .recording import call_signature
+
+__all__ = [
+        'load_traces',    # filename --> list of traces
+        'analyze',        # traces --> report
+        'replay',         # traces [, simulate] --> report
+        'format_report',  # report --> str
+        'Stub',
+        'StubTool',
+        ]
+
+
+def load_traces(filename):
+    with open(filename) as fo:
+        return [json.loads(line)
+                for line in fo
+                if line.strip()
+                ]
+
+
+def _spans(trace):
+    return sorted([event
+                   for event in trace['events']
+                   if event['type'] == 'span'
+                   ], key=lambda event: event['start'])
+
+
+def analyze(traces):
+    """
+    Return a dict {(hubtype, key): {'count', 'duplicates', 'seconds'}}
+    """
+    report = defaultdict(lambda: {'count': 0, 'duplicates': 0,
+                                  'seconds': 0.0})
+    for trace in traces:
+        seen = set()
+        for event in _spans(trace):
+            key = (event['hub'], event['key'])
+            entry = report[key]
+            entry['count'] += 1
+            entry['seconds'] += event['duration']
+            if key in seen:
+                entry['duplicates'] += 1
+            seen.add(key)
+    return dict(report)
+
+
+def format_report(report):
+    lines = ['%-40s %8s %6s %10s' % ('key', 'count', 'dupl', 'seconds')]
+    for key, entry in sorted(report.items(),
+                             key=lambda item: -item[1]['seconds']):
+        line = ('%-40s %8d %6d %10.4f'
+                % ('%s[%s]' % key,
+                   entry['count'], entry['duplicates'], entry['seconds']))
+        if entry.get('errors'):
+            line += '  (%d errors)' % entry['errors']
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# ------------------------------------------------ [ Stubs ... [
+class Stub(object):
+    """
+    Answers everything, without any information
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub()
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __getitem__(self, key):
+        return None
+
+    def __iter__(self):
+        return iter([])
+
+    def __len__(self):
+        return 0
+
+    def __bool__(self):
+        return False
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        return ''
+
+
+def _result(val):
+    if isinstance(val, dict) and list(val.keys()) == ['repr']:
+        return Stub()  # could not be recorded
+    return val
+
+
+class StubTool(object):
+    """
+    Answers the recorded calls of a hub value, in recorded order
+    """
+
+    def __init__(self, key, events, simulate=False):
+        self._key = key
+        self._simulate = simulate
+        self._calls = defaultdict(list)
+        for event in events:
+            if event['type'] == 'call' and event['key'] == key:
+                self._calls[(event['method'], event['args'])].append(event)
+
+    def _answer(self, name, args, kwargs):
+        calls = self._calls.get((name, call_signature(args, kwargs)))
+        if not calls:
+            return Stub()
+        event = calls.pop(0) if len(calls) > 1 else calls[0]
+        if self._simulate:
+            sleep(event['duration'])
+        return _result(event['result'])
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return self._answer(name, args, kwargs)
+        return method
+
+    def __call__(self, *args, **kwargs):
+        return self._answer('__call__', args, kwargs)
+
+
+class StubRequest(dict):
+
+    def __init__(self, trace):
+        dict.__init__(self)
+        self.form = dict(trace.get('form') or {})
+        self.other = {}
+        self.cookies = {}
+        self.RESPONSE = self.response = Stub()
+        self['ACTUAL_URL'] = trace.get('url')
+
+    def physicalPathToURL(self, path, relative=0):
+        url = '/'.join(path)
+        if relative:
+            return url
+        return 'http://nohost' + url
+
+
+class StubContext(Stub):
+
+    def __init__(self, request, path=('', 'plone')):
+        self.REQUEST = request
+        self._path = tuple(path)
+
+    def keys(self):
+        return []
+
+    def getPhysicalPath(self):
+        return self._path
+
+    def getId(self):
+        return self._path[-1]
+# ------------------------------------------------ ] ... Stubs ]
+
+
+def replay(traces, simulate=False):
+    """
+    Resolve the outermost info keys of the given traces again, and return
+    a report like analyze does.  When a key is resolved again in a
+    recorded request, a new pair of hubs is created (like the code which
+    created another hub did).
+    """
+    # Local imports:
+    from .hubs import make_hubs
+
+    exporter = tracing.ListExporter()
+    recorded = []
+    errors = defaultdict(int)
+    old_tracer = tracing.TRACER
+    tracing.enable_tracing(exporter)
+    try:
+        for trace in traces:
+            context = StubContext(StubRequest(trace))
+            stubs = dict([(event['key'],
+                           StubTool(event['key'], trace['events'], simulate))
+                          for event in trace['events']
+                          if event['type'] == 'span'
+                          and event['hub'] == 'hub'
+                          ])
+            hubs = None
+            seen = set()
+            del exporter.spans[:]
+            for event in _spans(trace):
+                if event['hub'] != 'info' or event['parent'] is not None:
+                    continue
+                key = event['key']
+                if hubs is None or key in seen:
+                    hub, info = hubs = make_hubs(context)
+                    for name, stub in stubs.items():
+                        dict.__setitem__(hub, name, stub)
+                    seen = set()
+                seen.add(key)
+                try:
+                    info[key]
+                except Exception:
+                    errors[key] += 1
+            recorded.append({'events': [
+                {'type': 'span',
+                 'hub': span['attributes']['infohubs.hub'],
+                 'key': span['attributes']['infohubs.key'],
+                 'parent': span['attributes']['infohubs.parent'],
+                 'start': span['start_time'],
+                 'duration': span['duration'],
+                 } for span in exporter.spans]})
+    finally:
+        tracing.TRACER = old_tracer
+    report = analyze(recorded)
+    for key, count in errors.items():
+        report.setdefault(('info', key), {'count': 0, 'duplicates': 0,
+                                          'seconds': 0.0})['errors'] = count
+    return report
+
+
+def main(args=None):
+    # Standard library:
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Analyze and replay the traces'
+                            ' recorded by visaplan.plone.infohubs')
+    parser.add_argument('filename')
+    parser.add_argument('--simulate', action='store_true',
+                        help='take the recorded time for stub tool calls')
+    parser.add_argument('--recorded-only', action='store_true',
+                        help="don't replay; analyze the recording only")
+    options = parser.parse_args(args)
+    traces = load_traces(options.filename)
+    print('Recorded (%d requests):' % len(traces))
+    print(format_report(analyze(traces)))
+    if not options.recorded_only:
+        print()
+        print('Replayed:')
+        print(format_report(replay(traces, options.simulate)))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:]:
+        main()
+    else:
+        # Standard library:
+        import doctest
+        doctest.testmod()
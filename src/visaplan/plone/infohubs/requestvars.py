@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Declared request variables: info keys which are taken from the request form
+
+Each variable is described by the info key name, the form field, an
+optional conversion function, a default value and a sequence of "null
+tokens" (values which are taken for None).  The form is parsed in a single
+pass into a record (a named tuple):
+
+>>> parse = compile_schema([
+...     RequestVar('audit-mode', 'audit-mode', makeBool, 'true'),
+...     RequestVar('uid', 'uid', None, None, ('',)),
+...     RequestVar('group_id', 'group_id', None, None, ('None', '')),
+...     ])
+>>> rec = parse({'uid': 'abc123', 'group_id': 'None'})
+>>> rec.audit_mode, rec.uid, rec.group_id
+(True, 'abc123', None)
+>>> parse({'audit-mode': 'no', 'uid': ''}).audit_mode
+False
+
+Invalid values are replaced by the (converted) default value:
+
+>>> parse({'audit-mode': 'maybe'}).audit_mode
+True
+
+The MISSING default makes a missing field distinguishable from an empty
+one:
+
+>>> parse = compile_schema([
+...     RequestVar('_requested_gid', 'gid', None, MISSING, ('None', '')),
+...     ])
+>>> parse({}).requested_gid is MISSING
+True
+>>> parse({'gid': 'None'}).requested_gid
+>>> parse({'gid': 'group_x'}).requested_gid
+'group_x'
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+import re
+from collections import namedtuple
+
+# visaplan:
+from visaplan.tools.minifuncs import makeBool
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'RequestVar',
+        'MISSING',
+        'REQUEST_VARS',         # the declared variables
+        'register_request_var',
+        'compile_schema',       # schema --> parse function
+        'request_var_parser',   # --> parse function for REQUEST_VARS
+        'attribute_name',       # info key --> record attribute
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+_RequestVar = namedtuple('RequestVar', 'name field type default nulls')
+
+
+def RequestVar(name, field, type=None, default=None, nulls=()):
+    """
+    name -- the info key
+    field -- the name of the form field
+    type -- a conversion function (applied to the default value as well)
+    default -- the value used if the field is missing
+    nulls -- form values which yield None
+    """
+    return _RequestVar(name, field, type, default, tuple(nulls))
+
+
+class _Missing(object):
+    def __repr__(self):
+        return 'MISSING'
+    __str__ = __repr__
+
+
+MISSING = _Missing()
+
+
+def attribute_name(name):
+    """
+    Return the record attribute for the given info key
+
+    >>> attribute_name('audit-mode')
+    'audit_mode'
+    >>> attribute_name('_make_tooltip_divs')
+    'make_tooltip_divs'
+    """
+    return re.sub('[^0-9a-zA-Z_]', '_', name).lstrip('_')
+
+
+def compile_schema(schema):
+    """
+    Return a function which parses a form into a record
+    """
+    schema = list(schema)
+    Record = namedtuple('RequestVars',
+                        [attribute_name(var.name) for var in schema])
+    specs = []
+    for var in schema:
+        default = var.default
+        convert = var.type
+        if convert is not None and default is not MISSING:
+            default = convert(default)
+        specs.append((var.field, convert, default, var.nulls))
+
+    def parse(form):
+        values = []
+        append = values.append
+        get = form.get
+        for field, convert, default, nulls in specs:
+            val = get(field, MISSING)
+            if val is MISSING:
+                append(default)
+            elif val in nulls:
+                append(None)
+            elif convert is None:
+                append(val)
+            else:
+                try:
+                    append(convert(val))
+                except (ValueError, TypeError) as e:
+                    logger.warning('request variable %r: invalid value %r'
+                                   ' (%s)', field, val, e)
+                    append(default)
+        return Record(*values)
+
+    return parse
+
+
+REQUEST_VARS = [
+    RequestVar('audit-mode', 'audit-mode', makeBool, 'true'),
+    # Tooltips erstmal nur auf Anforderung:
+    RequestVar('_make_tooltip_divs', 'tooltip_divs', makeBool, 'yes'),
+    RequestVar('uid', 'uid', None, None, ('',)),
+    # im Management-Interface verwendet:
+    RequestVar('group_id', 'group_id', None, None, ('None', '')),
+    RequestVar('export_profile_id', 'pid'),
+    # for info['gid']; if missing, the session data are used:
+    RequestVar('_requested_gid', 'gid', None, MISSING, ('None', '')),
+    ]
+_PARSER = []
+
+
+def register_request_var(*args, **kwargs):
+    """
+    Declare another request variable (see RequestVar for the arguments);
+    to be used before the first hub is created
+    """
+    var = RequestVar(*args, **kwargs)
+    REQUEST_VARS[:] = [v for v in REQUEST_VARS
+                       if v.name != var.name] + [var]
+    del _PARSER[:]
+
+
+def request_var_parser():
+    """
+    Return the parse function for the declared request variables
+    """
+    try:
+        return _PARSER[0]
+    except IndexError:
+        _PARSER.append(compile_schema(REQUEST_VARS))
+        return _PARSER[0]
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
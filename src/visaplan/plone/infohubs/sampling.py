@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Sampling profiler: which info and hub keys take the time?
+
+A background thread looks at the key stacks of the request threads (see
+.tracing) at a fixed rate and counts, for each sample, the stack of keys
+currently being resolved (outermost first); the innermost key is the one
+which "gets" the sample.  The counts are kept as collapsed stacks, i.e. in
+the input format of flamegraph.pl and compatible tools:
+
+    info[user_email];info[author_object];hub[author] 17
+
+Note that these are wall-clock samples: a thread which waits (e.g. for the
+ZODB) while resolving a key is counted as well.
+
+>>> sampler = Sampler(interval=0.01)
+>>> from .tracing import KEY_STACKS
+>>> KEY_STACKS[-1] = [('info', 'user_email', None), ('hub', 'author', None)]
+>>> KEY_STACKS[-2] = []
+>>> sampler.sample(); sampler.sample()
+>>> del KEY_STACKS[-1], KEY_STACKS[-2]
+>>> print(sampler.collapsed())
+info[user_email];hub[author] 2
+>>> sampler.samples
+2
+
+Sampling is switched on by the product configuration (interval in
+milliseconds; the file is rewritten every minute and on demand):
+
+    <product-config visaplan.plone.infohubs>
+        sampling-interval 10
+        sampling-file /path/to/var/log/infohubs-samples.txt
+    </product-config>
+
+The current counts can be pulled from a running instance by managers, using
+the @@infohubs-samples view.
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six.moves._thread import get_ident
+
+# Standard library:
+import os
+from collections import Counter
+from threading import Event, Lock, Thread
+from timeit import default_timer
+
+# Local imports:
+from . import tracing
+from .config import product_config
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'Sampler',
+        'start_sampling',     # [interval, filename] --> Sampler
+        'stop_sampling',
+        'collapsed_stacks',   # --> str (collapsed stack format)
+        'write_samples',      # [filename] --> filename
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+SAMPLER = None  # the running Sampler, if any
+FLUSH_INTERVAL = 60.0
+
+
+class Sampler(Thread):
+    """
+    Background thread which samples the key stacks of all other threads
+    """
+
+    def __init__(self, interval=0.01, filename=None,
+                 flush_interval=FLUSH_INTERVAL):
+        Thread.__init__(self, name='infohubs-sampler')
+        self.daemon = True
+        self.interval = interval
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.counts = Counter()
+        self.samples = 0
+        self._lock = Lock()
+        self._stopped = Event()
+
+    def sample(self):
+        own = get_ident()
+        found = []
+        for ident, stack in list(tracing.KEY_STACKS.items()):
+            if ident == own:
+                continue
+            stack = list(stack)
+            if stack:
+                found.append(';'.join(['%s[%s]' % entry[:2]
+                                       for entry in stack
+                                       ]))
+        with self._lock:
+            self.samples += 1
+            for line in found:
+                self.counts[line] += 1
+
+    def collapsed(self):
+        with self._lock:
+            items = sorted(self.counts.items())
+        return '\n'.join(['%s %d' % item for item in items])
+
+    def write(self, filename=None):
+        """
+        Write the collapsed stacks to the given file (or self.filename),
+        replacing it atomically
+        """
+        filename = filename or self.filename
+        tmp = '%s.tmp-%d' % (filename, os.getpid())
+        with open(tmp, 'w') as fo:
+            fo.write(self.collapsed())
+            fo.write('\n')
+        os.rename(tmp, filename)
+        return filename
+
+    def run(self):
+        last_flush = default_timer()
+        while not self._stopped.wait(self.interval):
+            self.sample()
+            if (self.filename
+                and default_timer() - last_flush >= self.flush_interval):
+                self._flush()
+                last_flush = default_timer()
+        if self.filename:
+            self._flush()
+
+    def _flush(self):
+        try:
+            self.write()
+        except (IOError, OSError) as e:
+            logger.error('Could not write samples to %s: %s',
+                         self.filename, e)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_sampling(interval=0.01, filename=None):
+    """
+    Start the sampling thread (if not running yet) and return it
+    """
+    global SAMPLER
+    if SAMPLER is None:
+        tracing.enable_key_stacks()
+        SAMPLER = Sampler(interval, filename)
+        SAMPLER.start()
+        logger.info('Sampling info keys every %s seconds', interval)
+    return SAMPLER
+
+
+def stop_sampling():
+    global SAMPLER
+    sampler, SAMPLER = SAMPLER, None
+    if sampler is not None:
+        sampler.stop()
+        sampler.join()
+        tracing.disable_key_stacks()
+    return sampler
+
+
+def collapsed_stacks():
+    """
+    Return the counts of the running sampler, in collapsed stack format
+    (an empty string if sampling is not active)
+    """
+    if SAMPLER is None:
+        return ''
+    return SAMPLER.collapsed()
+
+
+def write_samples(filename=None):
+    """
+    Write the counts of the running sampler now; return the file name
+    """
+    if SAMPLER is None:
+        return None
+    return SAMPLER.write(filename)
+
+
+def sampling_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting:
+    start sampling if the sampling-interval option is given
+    """
+    config = product_config()
+    interval = config.get('sampling-interval')
+    if not interval:
+        return
+    try:
+        interval = float(interval) / 1000
+    except ValueError:
+        logger.error('sampling-interval: number (of milliseconds)'
+                     ' expected; got %(interval)r', locals())
+        return
+    start_sampling(interval, config.get('sampling-file'))
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
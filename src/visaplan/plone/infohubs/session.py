@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Lazy access to the session data
+
+info['session'] used to create a session as soon as it was touched (and
+even stored None for missing keys); a new session means a cookie and
+writes to the temp_folder, which spoils proxy caching.  The LazySessionProxy
+reads an existing session only, and creates one on the first write.
+
+>>> class Session(dict):
+...     def set(self, key, val):
+...         self[key] = val
+>>> class SDM(object):
+...     def __init__(self):
+...         self.session = None
+...     def getSessionData(self, create=1):
+...         if self.session is None and create:
+...             self.session = Session()
+...         return self.session
+>>> sdm = SDM()
+>>> proxy = LazySessionProxy(sdm)
+>>> proxy['unitracc_desktop_groups'] is None
+True
+>>> sdm.session is None
+True
+>>> proxy['unitracc_desktop_groups'] = ['group_a']
+>>> sdm.session
+{'unitracc_desktop_groups': ['group_a']}
+>>> LazySessionProxy(sdm)['unitracc_desktop_groups']
+['group_a']
+
+All read access goes to the session (if there is one):
+
+>>> sdm = SDM()
+>>> proxy = LazySessionProxy(sdm)
+>>> proxy.get('gid', 'default'), 'gid' in proxy, list(proxy.items())
+('default', False, [])
+>>> proxy.pop('gid', 'default'), len(proxy), sdm.session
+('default', 0, None)
+>>> proxy['gid'] = 'group_a'
+>>> proxy.get('gid'), 'gid' in proxy, list(proxy.keys()), len(proxy)
+('group_a', True, ['gid'], 1)
+>>> proxy.pop('gid'), sdm.session
+('group_a', {})
+>>> proxy.setdefault('gid', 'group_b'), proxy.setdefault('gid', 'group_c')
+('group_b', 'group_b')
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six.moves.collections_abc import MutableMapping
+
+__all__ = [
+        'LazySessionProxy',
+        ]
+
+_MISSING = object()
+
+
+class LazySessionProxy(MutableMapping):
+    """
+    The session as a mapping; missing keys yield None.
+    A session is created by the first write only.
+    """
+
+    def __init__(self, sdm):
+        self._sdm = sdm  # the session_data_manager
+        self._session = None
+
+    def _existing_session(self):
+        session = self._session
+        if session is None:
+            # (perhaps created by another proxy in the meantime)
+            session = self._sdm.getSessionData(create=0)
+            self._session = session
+        return session
+
+    def __getitem__(self, key):
+        session = self._existing_session()
+        if session is None:
+            return None
+        return session.get(key)
+
+    def get(self, key, default=None):
+        session = self._existing_session()
+        if session is None:
+            return default
+        return session.get(key, default)
+
+    def __contains__(self, key):
+        session = self._existing_session()
+        return session is not None and key in session
+
+    def __iter__(self):
+        session = self._existing_session()
+        if session is None:
+            return iter(())
+        return iter(list(session.keys()))
+
+    def __len__(self):
+        session = self._existing_session()
+        if session is None:
+            return 0
+        return len(session)
+
+    def __setitem__(self, key, val):
+        session = self._existing_session()
+        if session is None:
+            session = self._session = self._sdm.getSessionData(create=1)
+        session.set(key, val)
+
+    def __delitem__(self, key):
+        session = self._existing_session()
+        if session is not None:
+            try:
+                del session[key]
+            except KeyError:
+                pass
+
+    def pop(self, key, default=_MISSING):
+        session = self._existing_session()
+        if session is not None and key in session:
+            val = session[key]
+            del session[key]
+            return val
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def setdefault(self, key, default=None):
+        session = self._existing_session()
+        if session is not None and key in session:
+            return session[key]
+        self[key] = default
+        return default
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
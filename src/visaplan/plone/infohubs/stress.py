@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Stress test and benchmark for the shared caches, with stub components
+
+Several process-wide caches (view factories, translations, export
+profiles, well-known objects ...) are shared by the worker threads of a
+Zope instance.  This module runs N threads which simulate requests of
+different users (some of them anonymous) in two stub sites (see .testing):
+each creates hubs for a stub context and resolves a mix of info and hub
+keys, checking that no value of another request, user, language or site
+leaks through -- neither from the per-request caches nor from the shared
+ones (translations for anonymous users, well-known objects, view factories,
+provided values of process scope).  The module locks are replaced by
+TimedLocks during the run, to measure how long the threads waited for them.
+
+From the command line (no Plone site needed):
+
+    python -m visaplan.plone.infohubs.stress [--requests 500] [1 2 4 8 16]
+
+The TimedLock counts acquisitions and waiting times:
+
+>>> lock = TimedLock()
+>>> with lock:
+...     pass
+>>> lock.acquisitions, lock.contended, lock.wait_seconds
+(1, 0, 0.0)
+>>> lock.acquire(), lock.acquire(False)
+(True, False)
+>>> lock.release()
+
+No values leak, neither with one thread nor with several:
+
+>>> for threads in (1, 4):
+...     res = run_threads(threads, 30)
+...     print(threads, res['requests'], res['errors'])
+1 30 []
+4 120 []
+"""
+
+# Python compatibility:
+from __future__ import absolute_import, print_function
+
+from six.moves._thread import get_ident
+
+# Standard library:
+import sys
+from threading import Lock, Thread
+from timeit import default_timer
+
+# Zope:
+from AccessControl.SecurityManagement import (
+    newSecurityManager,
+    noSecurityManager,
+    )
+
+try:
+    # Zope:
+    from zope.component.hooks import getSite, setSite
+except ImportError:  # zope.app.component ist veraltet ...
+    # Zope:
+    from zope.app.component.hooks import getSite, setSite
+
+# Local imports:
+from .replay import StubRequest
+from .testing import (
+    LANGUAGES,
+    SITES,
+    VIEW_NAME,
+    ContextState,
+    Export,
+    PortalState,
+    StressContext,
+    User,
+    register_components,
+    unregister_components,
+    )
+from .wellknown import wellknown_brain, wellknown_path
+
+__all__ = [
+        'TimedLock',
+        'instrument_locks',  # --> {name: TimedLock}
+        'restore_locks',     # {name: TimedLock}
+        'run_threads',       # threads, requests --> result dict
+        'run_scaling',       # [thread counts, requests] --> list of results
+        ]
+
+# the modules with a module-level _LOCK:
+LOCKED_MODULES = ['diskcache', 'manifest', 'profiles', 'providers',
+                  'translations', 'viewcache', 'wellknown']
+
+
+class TimedLock(object):
+    """
+    A Lock which records how often (and how long) it was waited for
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, blocking=True):
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        if not blocking:
+            return False
+        started = default_timer()
+        self._lock.acquire()
+        # we hold the lock now; the counters are safe:
+        self.wait_seconds += default_timer() - started
+        self.acquisitions += 1
+        self.contended += 1
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def _module(name):
+    return __import__('visaplan.plone.infohubs.' + name,
+                      fromlist=['_LOCK'])
+
+
+def instrument_locks():
+    """
+    Replace the module locks by TimedLocks; return them, with the
+    original locks (for restore_locks)
+    """
+    res = {}
+    for name in LOCKED_MODULES:
+        module = _module(name)
+        res[name] = (TimedLock(), module._LOCK)
+        module._LOCK = res[name][0]
+    return res
+
+
+def restore_locks(instrumented):
+    for name, (timed, original) in instrumented.items():
+        _module(name)._LOCK = original
+
+
+def simulate_request(user_no, request_no, errors):
+    """
+    Create the hubs for one request of the given user (every third request
+    is anonymous), resolve a mix of keys, and record any values which don't
+    belong to this request
+    """
+    # Local imports:
+    from .hubs import make_hubs
+
+    anonymous = not request_no % 3
+    if anonymous:
+        user_id = None
+    else:
+        user_id = 'user%d' % user_no
+    lang = LANGUAGES[(user_no + request_no) % len(LANGUAGES)]
+    site = SITES[(user_no + request_no) % len(SITES)]
+    site_id = site.getId()
+    pid = str(user_no % 5)
+    request = StubRequest({'form': {'pid': pid}})
+    context = StressContext(request)
+    old_site = getSite()
+    setSite(site)
+    noSecurityManager()
+    if not anonymous:
+        newSecurityManager(request, User(user_id))
+    try:
+        for round in range(2):  # a second hub pair, as e.g. macros do
+            hub, info = make_hubs(context)
+            dict.__setitem__(hub, 'plone_portal_state',
+                             PortalState(lang, site))
+            dict.__setitem__(hub, 'plone_context_state', ContextState())
+            dict.__setitem__(hub, 'portal_catalog', site)
+            dict.__setitem__(hub, 'export', Export())
+            expected = [
+                ('user_id', user_id),
+                ('logged_in', not anonymous),
+                ('current_lang', lang),
+                ('thread_ident', get_ident()),
+                ('export_profile_title', 'Profile %s' % pid),
+                ('stress_process_value', site_id),
+                ('stress_request_value', user_id),
+                ]
+            for key, val in expected:
+                if info[key] != val:
+                    errors.append((key, val, info[key]))
+            profile = info['export_profile']
+            if profile['pid'] != pid or profile['formats']:
+                errors.append(('export_profile', pid, profile))
+            profile['formats'].append('leaked')  # must not be shared
+            # shared caches:
+            if hub['nonexisting_browser'] is not None:  # (view cache)
+                errors.append(('hub', None, hub['nonexisting_browser']))
+            view = hub[VIEW_NAME]
+            if view is None or view.request is not request:
+                errors.append((VIEW_NAME, request, view))
+            home = '/%s/home' % site_id
+            for func in (wellknown_path, wellknown_brain):
+                val = func(hub, 'stress_home')
+                if val != home:
+                    errors.append((func.__name__, home, val))
+            # (for anonymous users: from the process-wide cache)
+            translation = info['my_translation'][{'path': '/doc'}]
+            path = ('', site_id, lang, 'doc')
+            if translation is None or translation.getPhysicalPath() != path:
+                errors.append(('my_translation', path,
+                               translation and translation.getPhysicalPath()))
+    finally:
+        noSecurityManager()
+        setSite(old_site)
+
+
+def run_threads(threads, requests):
+    """
+    Run the given number of threads, each simulating the given number of
+    requests (of a thread-specific user); return a dict of results
+    """
+    errors = []
+    register_components()
+    instrumented = instrument_locks()
+
+    def work(user_no):
+        for request_no in range(requests):
+            simulate_request(user_no, request_no, errors)
+
+    workers = [Thread(target=work, args=(i,))
+               for i in range(threads)
+               ]
+    started = default_timer()
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        seconds = default_timer() - started
+        restore_locks(instrumented)
+        unregister_components()
+    locks = dict([(name, timed)
+                  for name, (timed, original) in instrumented.items()
+                  ])
+    return {'threads': threads,
+            'requests': threads * requests,
+            'seconds': seconds,
+            'throughput': threads * requests / seconds,
+            'lock_wait': sum([lock.wait_seconds for lock in locks.values()]),
+            'lock_contended': sum([lock.contended
+                                   for lock in locks.values()]),
+            'locks': locks,
+            'errors': errors,
+            }
+
+
+def run_scaling(counts=(1, 2, 4, 8, 16), requests=200):
+    return [run_threads(threads, requests)
+            for threads in counts
+            ]
+
+
+def main(args=None):
+    # Standard library:
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Stress test for the shared caches'
+                            ' of visaplan.plone.infohubs')
+    parser.add_argument('counts', nargs='*', type=int,
+                        default=[1, 2, 4, 8, 16],
+                        help='numbers of threads (default: %(default)s)')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per thread (default: %(default)s)')
+    options = parser.parse_args(args)
+    print('%7s %9s %9s %12s %10s %9s %7s'
+          % ('threads', 'requests', 'seconds', 'requests/s', 'lock wait',
+             'contended', 'errors'))
+    failed = False
+    for res in run_scaling(options.counts, options.requests):
+        print('%(threads)7d %(requests)9d %(seconds)9.3f %(throughput)12.1f'
+              ' %(lock_wait)10.4f %(lock_contended)9d' % res,
+              '%7d' % len(res['errors']))
+        for error in res['errors'][:10]:
+            print('  %s: expected %r, got %r' % error)
+        failed = failed or bool(res['errors'])
+    return int(failed)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:]:
+        sys.exit(main())
+    else:
+        # Standard library:
+        import doctest
+        doctest.testmod()
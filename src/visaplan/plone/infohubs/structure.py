@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+The structure of a book, shared by all hubs of a request
+
+info['st_num'], info['isBook'], info['isPresentation'] and
+info['isStructual'] used to ask the @@structurenumber, @@book,
+@@presentation and @@structuretype browsers for each hub; on
+table-of-contents pages, with a hub per chapter, the same questions were
+asked for again and again.  The BookStructureIndex of a book is created once
+per request; the book root is found via @@structuretype (once per book), and
+isBook and isPresentation are asked for the book root only.
+
+The structure numbers are computed from a single catalog query for the
+structural nodes of the book (product-config option
+``structure-portal-types``), in the order of their containers; other
+objects (images, files, ...) don't get a number:
+
+>>> class Brain(object):
+...     def __init__(self, path, uid):
+...         self.path, self.UID = path, uid
+...     def getPath(self):
+...         return self.path
+>>> brains = [Brain('/p/book/ch1', 'ch1'),
+...           Brain('/p/book/ch2', 'ch2'),
+...           Brain('/p/book/ch1/sec1', 'sec1'),
+...           Brain('/p/book/ch1/sec2', 'sec2'),
+...           Brain('/p/book/ch1/img/x', 'x')]
+>>> index = BookStructureIndex('/p/book', 'book', brains=brains)
+>>> [index.st_num(uid) for uid in ('book', 'ch1', 'sec1', 'sec2', 'ch2', 'x')]
+[0, '1', '1.1', '1.2', '2', None]
+>>> index.contains('/p/book/ch1/sec1'), index.contains('/p/bookshelf')
+(True, False)
+
+Without configured structural types, the numbers given by @@structurenumber
+are used (and kept for the request):
+
+>>> class StructureNumber(object):
+...     calls = 0
+...     def get(self, uid):
+...         StructureNumber.calls += 1
+...         return {'book': 0, 'ch1': '1', 'sec1': '1.1'}.get(uid)
+>>> index = BookStructureIndex('/p/book', 'book', StructureNumber())
+>>> [index.st_num(uid) for uid in ('book', 'ch1', 'sec1', 'ch1', 'sec1')]
+[0, '1', '1.1', '1', '1.1']
+>>> StructureNumber.calls
+2
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Local imports:
+from .config import config_list
+from .utils import request_cache
+
+__all__ = [
+        'BookStructureIndex',
+        'find_book_index',  # hub, info --> index or None
+        ]
+
+CACHE_KEY = 'book_indexes'
+
+
+def number_nodes(root_path, brains):
+    """
+    Return a dict uid --> dotted structure number for the given brains
+    (below root_path), which are expected in the order of their containers
+    """
+    children = {}  # parent path --> [(path, uid), ...]
+    for brain in brains:
+        path = brain.getPath()
+        parent = path.rsplit('/', 1)[0]
+        children.setdefault(parent, []).append((path, brain.UID))
+    numbers = {}
+    stack = [(root_path, '')]
+    while stack:
+        parent, prefix = stack.pop()
+        for i, (path, uid) in enumerate(children.get(parent, []), 1):
+            num = numbers[uid] = prefix + str(i)
+            stack.append((path, num + '.'))
+    return numbers
+
+
+class BookStructureIndex(object):
+    """
+    The structure of a book: numbers of the nodes, and the book-wide flags
+    """
+
+    def __init__(self, root_path, root_uid, structurenumber=None,
+                 brains=None):
+        self.root_path = root_path
+        self._prefix = root_path + '/'
+        self._source = structurenumber  # @@structurenumber
+        self._complete = brains is not None
+        if self._complete:
+            self._numbers = number_nodes(root_path, brains)
+        else:
+            self._numbers = {}  # uid --> structure number, as asked for
+        self._numbers[root_uid] = 0
+        self.isBook = None
+        self.isPresentation = None
+
+    def contains(self, path):
+        return path == self.root_path or path.startswith(self._prefix)
+
+    def st_num(self, uid):
+        try:
+            return self._numbers[uid]
+        except KeyError:
+            if self._complete:
+                return None
+            if self._source is None:
+                return 0
+            num = self._numbers[uid] = self._source.get(uid)
+            return num
+
+
+def find_book_index(hub, info):
+    """
+    Return the index of the book which contains the context (or None);
+    the indexes are shared by all hubs of the request.
+    """
+    brain = info['context_as_brain']
+    if brain is None:
+        return None
+    indexes = request_cache(info['request']).setdefault(CACHE_KEY, {})
+    path = brain.getPath()
+    for index in indexes.values():
+        if index.contains(path):
+            return index
+    structuretype = hub['structuretype']
+    if structuretype is None:
+        return None
+    root_brain = structuretype.getStructureFolderAsBrain(brain)
+    if not root_brain:
+        return None
+    root_path = root_brain.getPath()
+    try:
+        return indexes[root_path]
+    except KeyError:
+        pass
+    brains = None
+    portal_types = config_list('structure-portal-types')
+    if portal_types:
+        # unabhängig von den Rechten des Benutzers, wie @@structurenumber:
+        brains = hub['portal_catalog'].unrestrictedSearchResults(
+                path=root_path,
+                portal_type=portal_types,
+                sort_on='getObjPositionInParent')
+    index = BookStructureIndex(root_path, root_brain.UID,
+                               hub['structurenumber'], brains)
+    book = hub['book']
+    if book is not None:
+        index.isBook = bool(book.isBook(root_brain))
+    presentation = hub['presentation']
+    if presentation is not None:
+        index.isPresentation = presentation.isPresentation(root_brain.UID)
+    indexes[root_path] = index
+    return index
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Stub components for tests of visaplan.plone.infohubs (see .stress)
+
+Two stub sites with a catalog which knows a "home" object only, a document
+which is translated into all LANGUAGES, stub users and browsers, and
+info providers of process and request scope; register_components and
+unregister_components add and remove the global registrations (and the
+latter forgets the cached values of the stub sites):
+
+>>> [site.getId() for site in SITES]
+['site0', 'site1']
+>>> doc = SITES[1].restrictedTraverse('/doc')
+>>> doc.getPhysicalPath(), sorted(doc.getTranslations())
+(('', 'site1', 'de', 'doc'), ['de', 'en', 'fr'])
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Zope:
+from zope.component import getGlobalSiteManager
+from zope.interface import Interface
+
+try:
+    # Zope:
+    from zope.component.hooks import getSite
+except ImportError:  # zope.app.component ist veraltet ...
+    # Zope:
+    from zope.app.component.hooks import getSite
+
+# Local imports:
+from .providers import (
+    PER_PROCESS,
+    PER_REQUEST,
+    register_info_provider,
+    unregister_info_provider,
+    )
+from .profiles import invalidate_export_profiles
+from .replay import StubContext
+from .translations import invalidate_translations
+from .viewcache import invalidate_views
+from .wellknown import register_wellknown, unregister_wellknown
+
+__all__ = [
+        'SITES',
+        'User',
+        'PortalState',
+        'ContextState',
+        'Export',
+        'StressContext',
+        'register_components',    # global registrations of the stubs
+        'unregister_components',
+        ]
+
+LANGUAGES = ['de', 'en', 'fr']
+SITE_IDS = ['site0', 'site1']
+HOME_UID = 'stress-home-uid'
+VIEW_NAME = 'infohubs_stress_browser'  # (a browser, by its name)
+
+
+class User(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def getUserName(self):
+        return self.name
+
+    def getId(self):
+        return self.name
+
+    def getRoles(self):
+        return ['Member']
+
+
+class Membership(object):
+
+    def wrapUser(self, user):
+        return user
+
+
+class PortalState(object):
+
+    def __init__(self, lang, site):
+        self.lang = lang
+        self.site = site
+
+    def language(self):
+        return self.lang
+
+    def portal(self):
+        return self.site
+
+    def portal_url(self):
+        return 'http://nohost/' + self.site.getId()
+
+
+class ContextState(object):
+
+    def is_view_template(self):
+        return True
+
+    def view_url(self):
+        return 'http://nohost/doc/view'
+
+    def view_template_id(self):
+        return 'document_view'
+
+
+class Document(object):
+    """
+    A document in the given language; translated into all LANGUAGES
+    """
+
+    def __init__(self, site_id, lang):
+        self._path = ('', site_id, lang, 'doc')
+
+    def Language(self):
+        return self._path[2]
+
+    def getPhysicalPath(self):
+        return self._path
+
+    def getTranslations(self):
+        return dict([(lang, [Document(self._path[1], lang)])
+                     for lang in LANGUAGES
+                     ])
+
+
+class Site(object):
+
+    def __init__(self, site_id):
+        self._id = site_id
+        self._catalog = SiteCatalog(site_id)
+        self.portal_catalog = self
+
+    def getId(self):
+        return self._id
+
+    def getPhysicalPath(self):
+        return ('', self._id)
+
+    def getCounter(self):
+        return 1  # the same for all sites
+
+    def getSiteManager(self):
+        return getGlobalSiteManager()
+
+    def restrictedTraverse(self, path):
+        if isinstance(path, tuple):  # a cached physical path
+            assert path[1] == self._id, (path, self._id)
+            return Document(self._id, path[2])
+        return Document(self._id, 'de')  # the original language
+
+
+class UIDIndex(object):
+
+    def __init__(self, rid):
+        self._index = {HOME_UID: rid}
+
+
+class SiteCatalog(object):
+    """
+    The inner catalog (portal_catalog._catalog), with the home object only
+    """
+
+    def __init__(self, site_id):
+        self.rid = 1  # record ids are per catalog
+        self.paths = {self.rid: '/%s/home' % site_id}
+
+    def getIndex(self, name):
+        return UIDIndex(self.rid)
+
+    def __getitem__(self, rid):
+        return self.paths[rid]  # (a "brain")
+
+
+class StressView(object):
+    __roles__ = None  # public
+
+    def __init__(self, context, request):
+        self.context = context
+        self.request = request
+
+
+def process_value(context, hub, info):
+    # (provided value of process scope; must be computed per site)
+    return getSite().getId()
+
+
+def request_value(context, hub, info):
+    return info['user_id']
+
+
+class Export(object):
+
+    def getRawProfile(self, pid):
+        return {'pid': pid, 'title': 'Profile %s' % pid, 'formats': []}
+
+    def getProfileTitle(self, pid):
+        return 'Profile %s' % pid
+
+
+class StressContext(StubContext):
+
+    portal_membership = Membership()
+
+
+SITES = [Site(site_id) for site_id in SITE_IDS]
+
+
+def register_components():
+    register_wellknown('stress_home', uid=HOME_UID)
+    register_info_provider('stress_process_value', process_value,
+                           PER_PROCESS)
+    register_info_provider('stress_request_value', request_value,
+                           PER_REQUEST)
+    getGlobalSiteManager().registerAdapter(
+        StressView, (Interface, Interface), Interface, VIEW_NAME)
+
+
+def unregister_components():
+    unregister_wellknown('stress_home')
+    unregister_info_provider('stress_process_value')
+    unregister_info_provider('stress_request_value')
+    getGlobalSiteManager().unregisterAdapter(
+        StressView, (Interface, Interface), Interface, VIEW_NAME)
+    # forget what the stub sites left in the shared caches:
+    invalidate_views()
+    invalidate_translations()
+    invalidate_export_profiles()
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
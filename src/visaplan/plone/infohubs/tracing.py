@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Optional tracing of hub and info key resolution
+
+When tracing is active, each "cold" resolution of a hub[...] or info[...]
+key (i.e., when the value is not yet known) opens a span which carries the
+key, the kind of resolver (tool, view, browser, adapter, function, resolver
+for hub keys; FUNCMAP or provider for info keys), the parent key (which
+caused this one to be resolved) and the duration.  Finished spans are given
+to an exporter; when tracing is inactive (TRACER is None), only this check
+is done.
+
+>>> exporter = ListExporter()
+>>> tracer = enable_tracing(exporter)
+>>> outer = tracer.start('user_email', 'FUNCMAP', 'info')
+>>> inner = tracer.start('portal_membership', 'tool', 'hub')
+>>> tracer.finish(inner)
+>>> tracer.finish(outer)
+>>> disable_tracing()
+>>> [(s['name'], s['attributes']['infohubs.parent'])
+...  for s in exporter.spans]
+[('hub[portal_membership]', 'user_email'), ('info[user_email]', None)]
+>>> inner, outer = exporter.spans
+>>> inner['trace_id'] == outer['trace_id']
+True
+>>> inner['parent_span_id'] == outer['span_id']
+True
+>>> inner['duration'] >= 0
+True
+
+The key stacks of all threads are available, e.g. for the sampling profiler:
+
+>>> key_stack()
+[]
+
+The spans can be written to a file, one JSON object per line, with the
+JSONFileExporter (which keeps the file open and flushes its buffer at most
+once per second); if the opentelemetry-api package is installed, the
+OpenTelemetryExporter (not in __all__) passes them on to the configured
+OpenTelemetry tracer provider, with their parents.  Exporters which have an
+`open_span` method are told about spans when they are opened.  Tracing can be
+switched on by the product configuration:
+
+    <product-config visaplan.plone.infohubs>
+        tracing-file /path/to/var/log/infohubs-spans.jsonl
+    </product-config>
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six.moves._thread import get_ident
+
+# Setup tools:
+import pkg_resources
+
+# Standard library:
+import atexit
+import json
+from random import getrandbits
+from threading import Lock
+from time import time
+from timeit import default_timer
+
+# Local imports:
+from .config import product_config
+
+try:
+    pkg_resources.get_distribution('opentelemetry-api')
+except pkg_resources.DistributionNotFound:
+    HAS_OPENTELEMETRY = False
+else:
+    HAS_OPENTELEMETRY = True
+    # 3rd party:
+    from opentelemetry import trace as otel_trace
+
+__all__ = [
+        'TRACER',            # None, or the active (KeyStack)Tracer
+        'Tracer',
+        'KeyStackTracer',
+        'enable_tracing',    # exporter --> Tracer
+        'disable_tracing',
+        'enable_key_stacks',   # (for the sampling profiler)
+        'disable_key_stacks',
+        'key_stack',         # [ident] --> list of (hubtype, key)
+        'KEY_STACKS',        # ident --> list of (hubtype, key, span)
+        'ListExporter',
+        'JSONFileExporter',
+        ]
+
+TRACER = None
+# the keys currently resolved, per thread; read by the sampling profiler:
+KEY_STACKS = {}
+
+
+def _new_id():
+    return '%016x' % getrandbits(64)
+
+
+class Tracer(object):
+    """
+    Opens and finishes spans and gives them to the exporter
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+
+    def start(self, key, kind, hubtype):
+        """
+        hubtype -- 'hub' or 'info'
+        """
+        stack = KEY_STACKS.get(get_ident())
+        if stack is None:
+            stack = KEY_STACKS.setdefault(get_ident(), [])
+        if stack and stack[-1][2] is not None:
+            parent = stack[-1][2]
+            trace_id = parent['trace_id']
+            parent_key = parent['attributes']['infohubs.key']
+            parent_id = parent['span_id']
+        else:
+            trace_id = _new_id() + _new_id()
+            parent = parent_key = parent_id = None
+        span = {'name': '%s[%s]' % (hubtype, key),
+                'trace_id': trace_id,
+                'span_id': _new_id(),
+                'parent_span_id': parent_id,
+                'start_time': time(),
+                'attributes': {'infohubs.key': key,
+                               'infohubs.kind': kind,
+                               'infohubs.hub': hubtype,
+                               'infohubs.parent': parent_key,
+                               },
+                '_started': default_timer(),
+                }
+        stack.append((hubtype, key, span))
+        open_span = getattr(self.exporter, 'open_span', None)
+        if open_span is not None:
+            open_span(span, parent)
+        return span
+
+    def finish(self, span):
+        span['duration'] = default_timer() - span.pop('_started')
+        stack = KEY_STACKS.get(get_ident())
+        if stack and stack[-1][2] is span:
+            stack.pop()
+        self.exporter.export(span)
+
+    def wrap(self, key, val):
+        """
+        Return the value to be stored as hub[key]; the recorder (see
+        .recording) returns a proxy which records the calls
+        """
+        return val
+
+
+class KeyStackTracer(object):
+    """
+    Maintains the key stacks only (no spans, no export);
+    used by the sampling profiler if tracing is not active
+    """
+
+    def start(self, key, kind, hubtype):
+        stack = KEY_STACKS.get(get_ident())
+        if stack is None:
+            stack = KEY_STACKS.setdefault(get_ident(), [])
+        entry = (hubtype, key, None)
+        stack.append(entry)
+        return entry
+
+    def finish(self, entry):
+        stack = KEY_STACKS.get(get_ident())
+        if stack and stack[-1] is entry:
+            stack.pop()
+
+    def wrap(self, key, val):
+        return val
+
+
+def enable_tracing(exporter):
+    global TRACER
+    TRACER = Tracer(exporter)
+    return TRACER
+
+
+def disable_tracing():
+    global TRACER
+    TRACER = None
+
+
+def enable_key_stacks():
+    """
+    Make sure the key stacks are maintained; unless tracing is active
+    already, a KeyStackTracer is installed
+    """
+    global TRACER
+    if TRACER is None:
+        TRACER = KeyStackTracer()
+    return TRACER
+
+
+def disable_key_stacks():
+    """
+    Remove the KeyStackTracer (but not a real Tracer)
+    """
+    global TRACER
+    if isinstance(TRACER, KeyStackTracer):
+        TRACER = None
+
+
+def key_stack(ident=None):
+    """
+    Return the (kind, key) tuples of the open spans of the given thread
+    (by default: the current one), outermost first
+    """
+    if ident is None:
+        ident = get_ident()
+    return [entry[:2]
+            for entry in list(KEY_STACKS.get(ident) or [])
+            ]
+
+
+# ------------------------------------------------ [ Exporters ... [
+class ListExporter(object):
+    """
+    Keeps the spans in a list; for tests
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class JSONFileExporter(object):
+    """
+    Appends the spans to a file, one JSON object per line;
+    the file is kept open, and the buffer is flushed every flush_interval
+    seconds (and when closed)
+    """
+
+    def __init__(self, filename, flush_interval=1.0):
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._file = None
+        self._flushed = 0
+
+    def export(self, span):
+        line = json.dumps(span, sort_keys=True) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.filename, 'a')
+                atexit.register(self.close)
+            self._file.write(line)
+            now = default_timer()
+            if now - self._flushed >= self.flush_interval:
+                self._file.flush()
+                self._flushed = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+if HAS_OPENTELEMETRY:
+    class OpenTelemetryExporter(object):
+        """
+        Passes the spans on to an OpenTelemetry tracer
+        """
+
+        def __init__(self, name='visaplan.plone.infohubs'):
+            self.tracer = otel_trace.get_tracer(name)
+
+        def open_span(self, span, parent=None):
+            """
+            Open the OpenTelemetry span, as a child of the parent span
+            (if any; otherwise, of the current OpenTelemetry span)
+            """
+            context = None
+            if parent is not None and '_otel' in parent:
+                context = otel_trace.set_span_in_context(parent['_otel'])
+            attributes = dict([(key, val)
+                               for key, val in span['attributes'].items()
+                               if val is not None
+                               ])
+            span['_otel'] = self.tracer.start_span(
+                    span['name'],
+                    context=context,
+                    start_time=int(span['start_time'] * 1e9),
+                    attributes=attributes)
+
+        def export(self, span):
+            otel_span = span.pop('_otel', None)
+            if otel_span is None:  # not started by this exporter
+                self.open_span(span)
+                otel_span = span.pop('_otel')
+            start = int(span['start_time'] * 1e9)
+            otel_span.end(end_time=start + int(span['duration'] * 1e9))
+# ------------------------------------------------ ] ... Exporters ]
+
+
+def tracing_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting:
+    switch tracing on if the tracing-file option is given
+    """
+    filename = product_config().get('tracing-file')
+    if filename:
+        enable_tracing(JSONFileExporter(filename))
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
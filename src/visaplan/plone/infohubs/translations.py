@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Language-aware caching: current language and translated lookups
+
+The negotiated language (info['current_lang']) is determined once per
+request and shared by all hubs.
+
+The results of info['my_translation'] are cached across requests, per site,
+specification (path and/or uid) and language, as physical paths -- but only
+for anonymous users, who all see the same; the cached object is traversed
+to (with security checks), which is much cheaper than the catalog lookup and
+the translation search.
+
+>>> class Obj(object):
+...     def __init__(self, path):
+...         self.path = path
+...     def getPhysicalPath(self):
+...         return self.path
+...     def __repr__(self):
+...         return '<Obj %s>' % '/'.join(self.path)
+>>> class Portal(object):
+...     def restrictedTraverse(self, path):
+...         return Obj(tuple(path))
+>>> calls = []
+>>> def lookup(spec):
+...     calls.append(spec)
+...     return Obj(('', 'plone', 'en', 'welcome'))
+>>> func = cached_translations(lookup, 'en', Portal())
+>>> spec = (('path', '/de/willkommen'),)
+>>> func(spec)
+<Obj /plone/en/welcome>
+>>> func(spec)
+<Obj /plone/en/welcome>
+>>> len(calls)
+1
+
+The entries expire after some time (product-config option
+``translations-cache-ttl``, in seconds), since changes done in other ZEO
+clients are not noticed otherwise.  Changes done in this process are
+noticed by subscribers, which forget the affected entries only:
+
+- when an object is added (e.g. a new translation), the entries of
+  unsuccessful lookups;
+- when an object is moved or removed, the entries which point to it (or
+  into it), or which refer to its old path;
+- when an object is modified (e.g. its language), the entries which point
+  to it or refer to it.
+
+>>> class Event(object):
+...     oldParent = None
+>>> invalidate_translations(Obj(('', 'plone', 'en', 'other')), Event())
+>>> func(spec)
+<Obj /plone/en/welcome>
+>>> len(calls)
+1
+>>> modified = Obj(('', 'plone', 'en', 'welcome'))
+>>> invalidate_translations(modified, Event())
+>>> func(spec)
+<Obj /plone/en/welcome>
+>>> len(calls)
+1
+>>> object_modified(modified, None)
+>>> func(spec)
+<Obj /plone/en/welcome>
+>>> len(calls)
+2
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from threading import Lock
+from time import time
+
+# Zope:
+from AccessControl import Unauthorized
+
+# Local imports:
+from .config import product_config
+from .utils import request_cache, site_key
+
+__all__ = [
+        'request_language',         # hub, request --> language code
+        'cached_translations',      # func, lang, portal --> func
+        'invalidate_translations',  # [obj, event]; for IObjectMovedEvent
+        'object_modified',          # subscriber for IObjectModifiedEvent
+        ]
+
+CACHE_KEY = 'current_lang'
+DEFAULT_TTL = 600  # seconds
+_NOTFOUND = (0, None)
+_CACHE = {}  # site key --> {(spec, lang): (expiry, physical path or None)}
+_LOCK = Lock()
+
+
+def request_language(hub, request):
+    """
+    Return the language of the request, as negotiated by Plone;
+    it is determined once per request.
+    """
+    cache = request_cache(request)
+    try:
+        return cache[CACHE_KEY]
+    except KeyError:
+        lang = cache[CACHE_KEY] = hub['plone_portal_state'].language()
+        return lang
+
+
+def cached_translations(func, lang, portal):
+    """
+    Wrap the given lookup function (spec --> object or None) by a function
+    which uses the process-wide cache; for anonymous users only!
+    """
+    key = site_key()
+    cache = _CACHE.get(key)
+    if cache is None:
+        cache = _CACHE.setdefault(key, {})
+    ttl = float(product_config().get('translations-cache-ttl', DEFAULT_TTL))
+
+    def cached(spec):
+        expiry, path = cache.get((spec, lang), _NOTFOUND)
+        if expiry > time():
+            if path is None:
+                return None
+            try:
+                return portal.restrictedTraverse(path)
+            except (AttributeError, KeyError, Unauthorized):
+                pass  # vanished or protected in the meantime
+        o = func(spec)
+        if o is None:
+            path = None
+        else:
+            path = tuple(o.getPhysicalPath())
+        with _LOCK:
+            cache[(spec, lang)] = (time() + ttl, path)
+        return o
+
+    return cached
+
+
+def _forget(affected):
+    """
+    Forget the entries for which affected(spec, path) is true
+    """
+    with _LOCK:
+        for cache in _CACHE.values():
+            for key, (expiry, path) in list(cache.items()):
+                if affected(key[0], path):
+                    cache.pop(key, None)
+
+
+def _refers_to(spec, site_path, phys_path, uid=None):
+    """
+    Does the given spec refer to the object (or into the container) at
+    the given physical path (or to the given UID)?
+    """
+    for key, val in spec:
+        if key == 'uid':
+            if uid is not None and val == uid:
+                return True
+        elif key == 'path' and val:
+            if _within(site_path + (val.lstrip('/'),), phys_path):
+                return True
+    return False
+
+
+def _within(path, phys_path):
+    """
+    Is the given path (tuple, or tuple with a trailing relative path) at or
+    below phys_path?
+    """
+    path = '/'.join(path)
+    prefix = '/'.join(phys_path)
+    return path == prefix or path.startswith(prefix + '/')
+
+
+def invalidate_translations(obj=None, event=None):
+    """
+    Forget the cached translation lookups affected by the event
+    (all, if none given); subscriber for IObjectMovedEvent
+    """
+    if not _CACHE:
+        return
+    if event is None:
+        with _LOCK:
+            for cache in _CACHE.values():
+                cache.clear()  # might be in use by a running request
+            _CACHE.clear()
+        return
+    if event.oldParent is None:  # added: perhaps a missing translation
+        _forget(lambda spec, path: path is None)
+        return
+    old = (tuple(event.oldParent.getPhysicalPath())
+           + (event.oldName,))
+    site_path = site_key() or ('',)
+
+    def affected(spec, path):
+        return ((path is not None and _within(path, old))
+                or _refers_to(spec, site_path, old))
+    _forget(affected)
+
+
+def object_modified(obj, event):
+    """
+    Subscriber for IObjectModifiedEvent: forget the cached lookups which
+    refer to the modified object, or point to it (its language might have
+    changed)
+    """
+    if not _CACHE:
+        return
+    phys_path = tuple(obj.getPhysicalPath())
+    uid = getattr(obj, 'UID', None)
+    if callable(uid):
+        uid = uid()
+    site_path = site_key() or ('',)
+
+    def affected(spec, path):
+        return (path == phys_path
+                or _refers_to(spec, site_path, phys_path, uid))
+    _forget(affected)
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
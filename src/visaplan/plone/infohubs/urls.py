@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Request-level cache of URLs, by physical path
+
+The URL of an object is its parent's URL plus its (quoted) id -- below the
+virtual root, at least, which is where virtual hosting rewrites end.  Thus,
+once the URL of a folder is known, the URLs of its children (and of the
+children's children) are derived by simple string operations; listings and
+breadcrumbs don't need to compute each URL from scratch.
+
+>>> class Request(object):
+...     other = {'VirtualRootPhysicalPath': ('', 'plone')}
+...     calls = 0
+...     def physicalPathToURL(self, path, relative=0):
+...         Request.calls += 1
+...         assert tuple(path[:2]) == ('', 'plone')
+...         tail = ''.join(['/' + name for name in path[2:]])
+...         if relative:
+...             return tail
+...         return 'https://www.example.com' + tail
+>>> urls = URLCache(Request())
+>>> urls.url(('', 'plone', 'folder', 'doc'))
+'https://www.example.com/folder/doc'
+>>> urls.url('/plone/folder/other doc')
+'https://www.example.com/folder/other%20doc'
+>>> urls.url_path(('', 'plone', 'folder', 'doc'))
+'/folder/doc'
+>>> urls.url_path(('', 'plone'))
+'/'
+>>> Request.calls
+2
+
+(one call for the virtual root, for each of the absolute and relative URLs).
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+from six import string_types as six_string_types
+from six.moves.urllib.parse import quote
+
+# Local imports:
+from .utils import request_cache
+
+__all__ = [
+        'URLCache',
+        'request_urls',  # request --> URLCache
+        ]
+
+CACHE_KEY = 'urls'
+
+
+class URLCache(object):
+    """
+    The absolute URLs and URL paths of the physical paths known so far
+    """
+
+    def __init__(self, request):
+        self._request = request
+        self._urls = {}  # (path, relative) --> URL
+        other = getattr(request, 'other', None) or {}
+        self._root = tuple(other.get('VirtualRootPhysicalPath') or ('',))
+
+    def _url(self, path, relative):
+        key = (path, relative)
+        try:
+            return self._urls[key]
+        except KeyError:
+            pass
+        root = self._root
+        if len(path) > len(root) and path[:len(root)] == root:
+            # below the virtual root: derived from the parent's URL
+            url = self._url(path[:-1], relative) + '/' + quote(path[-1])
+        else:
+            url = self._request.physicalPathToURL(path, relative)
+        self._urls[key] = url
+        return url
+
+    def url(self, path):
+        """
+        Return the absolute URL for the given physical path
+        (a tuple, or a string, as returned by brain.getPath())
+        """
+        if isinstance(path, six_string_types):
+            path = path.split('/')
+        return self._url(tuple(path), 0)
+
+    def url_path(self, path):
+        """
+        Like url, but return the URL path (like absolute_url_path)
+        """
+        if isinstance(path, six_string_types):
+            path = path.split('/')
+        return self._url(tuple(path), 1) or '/'
+
+
+def request_urls(request):
+    """
+    Return the URLCache of the given request
+    """
+    cache = request_cache(request)
+    try:
+        return cache[CACHE_KEY]
+    except KeyError:
+        urls = cache[CACHE_KEY] = URLCache(request)
+        return urls
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
@@ -4,6 +4,18 @@
 from __future__ import absolute_import
 
 from six import string_types as six_string_types
+from six.moves._thread import get_ident
+
+# Standard library:
+from collections import namedtuple
+from time import localtime, strftime, time
+
+try:
+    # Zope:
+    from zope.component.hooks import getSite
+except ImportError:  # zope.app.component ist veraltet ...
+    # Zope:
+    from zope.app.component.hooks import getSite
 
 __all__ = [
         'make_toolDetector',  # recognize "tools names"
@@ -12,8 +24,18 @@ __all__ = [
         'gimme_1',
         'attribute_factory',
         'sorted_nonempty_item_tuples',
+        'request_cache',
+        'request_clock',  # request --> RequestClock
+        'BulkProxy',
+        'site_key',
+        'catalog_counter',  # catalog --> modification counter (or None)
+        'parse_named_sizes',  # allowed_sizes --> {name: [width, height]}
         ]
 
+REQUEST_CACHE_KEY = '_visaplan_infohubs'
+TIMESTAMP_FN = '%Y-%m-%d_%H%M%S'  # Timestamp-Format für Dateinamen
+_NAMED_SIZES = {}  # allowed_sizes (text) --> {name: (width, height)}
+
 
 def make_toolDetector(**kwargs):
     """
@@ -148,9 +170,195 @@ def sorted_nonempty_item_tuples(dic):
         if val is not None:
             res.append((key, val))
     return tuple(sorted(res))
+
+
+def request_cache(request):
+    """
+    Return a dict which is shared by all hubs created during the given request
+
+    >>> class Request(object):
+    ...     def __init__(self):
+    ...         self.other = {}
+    >>> request = Request()
+    >>> cache = request_cache(request)
+    >>> cache
+    {}
+    >>> cache is request_cache(request)
+    True
+
+    The dict lives in the request's `other` dictionary, like all variables
+    set by request.set(); thus, it vanishes with the request.
+    Request-like objects without `other` get an attribute:
+
+    >>> class Fake(object):
+    ...     pass
+    >>> fake = Fake()
+    >>> request_cache(fake) is request_cache(fake)
+    True
+    """
+    other = getattr(request, 'other', None)
+    if other is None:
+        try:
+            return getattr(request, REQUEST_CACHE_KEY)
+        except AttributeError:
+            cache = {}
+            setattr(request, REQUEST_CACHE_KEY, cache)
+            return cache
+    try:
+        return other[REQUEST_CACHE_KEY]
+    except KeyError:
+        cache = other[REQUEST_CACHE_KEY] = {}
+        return cache
+
+
+RequestClock = namedtuple('RequestClock',
+                          'timestamp timestamp_fn thread_ident')
+
+
+def request_clock(request):
+    """
+    Return the clock record of the given request: the time of the first
+    call, the same formatted for use in filenames (TIMESTAMP_FN), and the
+    ident of the request thread.  All hubs of the request share it; thus,
+    all files of one export get the same timestamp.
+
+    >>> class Request(object):
+    ...     def __init__(self):
+    ...         self.other = {}
+    >>> request = Request()
+    >>> clock = request_clock(request)
+    >>> clock is request_clock(request)
+    True
+    >>> len(clock.timestamp_fn)
+    17
+    >>> clock.thread_ident == get_ident()
+    True
+    """
+    cache = request_cache(request)
+    try:
+        return cache['clock']
+    except KeyError:
+        now = time()
+        clock = cache['clock'] = RequestClock(
+                now, strftime(TIMESTAMP_FN, localtime(now)), get_ident())
+        return clock
+
+
+def site_key():
+    """
+    Return a hashable key for the current site (its physical path),
+    for caches which are kept per site; None outside of a site
+    """
+    site = getSite()
+    if site is None:
+        return None
+    try:
+        return tuple(site.getPhysicalPath())
+    except AttributeError:
+        return None
+
+
+def catalog_counter(catalog):
+    """
+    Return the modification counter of the given catalog, which is changed
+    by every (re-, un-)indexing, in every ZEO client; for process-level
+    caches of catalog data.
+
+    >>> class Catalog(object):
+    ...     def getCounter(self):
+    ...         return 42
+    >>> catalog_counter(Catalog()), catalog_counter(object())
+    (42, None)
+    """
+    try:
+        return catalog.getCounter()
+    except AttributeError:  # very old ZCatalog
+        return None
+
+
+def parse_named_sizes(allowed_sizes):
+    """
+    Parse the allowed_sizes property of the imaging properties;
+    each distinct value is parsed once per process
+
+    >>> sizes = parse_named_sizes('large 768:768\\n  mini 200:200')
+    >>> sorted(sizes.items())
+    [('large', [768, 768]), ('mini', [200, 200])]
+    >>> sizes['mini'].append(1)  # changes our copy only
+    >>> parse_named_sizes('large 768:768\\n  mini 200:200')['mini']
+    [200, 200]
+    """
+    try:
+        parsed = _NAMED_SIZES[allowed_sizes]
+    except KeyError:
+        parsed = {}
+        for line in allowed_sizes.split('\n'):
+            key, size = line.strip().split()
+            parsed[key] = tuple(map(int, size.split(':')))
+        _NAMED_SIZES[allowed_sizes] = parsed
+    return dict([(key, list(dim))
+                 for key, dim in parsed.items()
+                 ])
 # ------------------------------------- ] ... kleine Hilfsfunktionen ]
 
 
+class BulkProxy(dict):
+    """
+    Like the visaplan.tools.classes.Proxy, this dict caches the results of a
+    function; the `many` method resolves a whole sequence of keys, using a
+    bulk function for the keys which are not yet known.
+
+    >>> calls = []
+    >>> def double(x):
+    ...     calls.append([x])
+    ...     return x * 2
+    >>> def double_many(seq):
+    ...     calls.append(sorted(seq))
+    ...     return dict([(x, x * 2) for x in seq])
+    >>> p = BulkProxy(double, double_many)
+    >>> p[1]
+    2
+    >>> p.many([3, 1, 2, 3])
+    [6, 2, 4, 6]
+    >>> calls
+    [[1], [2, 3]]
+
+    Keys missing in the result of the bulk function get None:
+
+    >>> p2 = BulkProxy(double, lambda seq: {})
+    >>> p2.many(['a'])
+    [None]
+    """
+
+    def __init__(self, func, bulkfunc):
+        dict.__init__(self)
+        self._func = func
+        self._bulkfunc = bulkfunc
+
+    def __getitem__(self, key):
+        if key in self:
+            return dict.__getitem__(self, key)
+        val = self._func(key)
+        dict.__setitem__(self, key, val)
+        return val
+
+    def many(self, keys):
+        """
+        Return the list of values for the given keys
+        """
+        keys = list(keys)
+        missing = set([key for key in keys
+                       if key not in self
+                       ])
+        if missing:
+            found = self._bulkfunc(missing)
+            get = found.get
+            for key in missing:
+                dict.__setitem__(self, key, get(key))
+        getitem = dict.__getitem__
+        return [getitem(self, key) for key in keys]
+
+
 if __name__ == '__main__':
     # Standard library:
     import doctest
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Variance of info keys: what does the output of a request depend on?
+
+Each info key is classified by the dimension its value varies with (beyond
+the URL, which includes the context and the form data):
+
+- global: the same for all users (e.g. portal_url, context_title)
+- language: the negotiated language (current_lang, my_translation)
+- user: the authenticated user (user_id, logged_in, is_member_of ...)
+- session: the session data (session, gid)
+- request: each request (timestamp_fn, counters, the request and response
+  objects and the raw form data ...)
+
+The dimensions of all info keys resolved during a request are collected;
+at the end, the "vary" set tells whether the page can be cached for
+anonymous users or shared between users, and the fingerprint (computed from
+the values of current_lang, user id and gid, as far as they matter) can be
+used as an ETag component:
+
+>>> record = VarianceRecord()
+>>> for key, val in [('portal_url', 'http://nohost/plone'),
+...                  ('current_lang', 'de')]:
+...     record.record(key, val)
+>>> sorted(record.vary())
+['language']
+>>> fp = record.fingerprint()
+>>> len(fp)
+40
+>>> record.record('user_id', 'joe')
+>>> sorted(record.vary())
+['language', 'user']
+>>> record.fingerprint() != fp
+True
+>>> record.record('timestamp_fn', '2020-07-15_120000')
+>>> record.fingerprint() is None
+True
+
+Keys which are taken from the view state, like portal_url, don't vary with
+the language:
+
+>>> record = VarianceRecord()
+>>> for key in ('view_state', 'portal_url', 'audit-mode'):
+...     record.record(key, None)
+>>> sorted(record.vary()), len(record.fingerprint())
+([], 40)
+
+Whoever uses the request (or response) object itself may read anything from
+it (cookies, headers ...):
+
+>>> record.record('request', None)
+>>> sorted(record.vary()), record.fingerprint()
+(['request'], None)
+
+Keys of unknown variance (e.g. from providers of other packages, which can
+declare it by register_variance) are considered to vary per request:
+
+>>> record = VarianceRecord()
+>>> record.record('some_unknown_key', 42)
+>>> sorted(record.vary()), sorted(record.unclassified)
+(['request'], ['some_unknown_key'])
+
+Optionally (product-config option variance-headers), the results are sent
+as response headers X-Infohubs-Vary and X-Infohubs-Fingerprint, e.g. for
+the rules of a caching proxy.
+
+Limitations: only the info keys resolved by the InfoHub are recorded (once
+per hub, when resolved; later accesses use the same value).  Values stored
+into the hub directly are not recorded, and neither are accesses to the
+ToolsHub: a template which asks e.g. hub['plone_portal_state'] or
+hub['portal_membership'] directly (rather than info['current_lang'] or
+info['user_id']) may vary with dimensions which are not reported.
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from hashlib import sha1
+
+# Local imports:
+from .config import config_flag
+from .requestvars import REQUEST_VARS
+from .utils import REQUEST_CACHE_KEY, request_cache
+
+__all__ = [
+        'GLOBAL', 'LANGUAGE', 'USER', 'SESSION', 'REQUEST',
+        'VarianceRecord',
+        'register_variance',    # key, dimension
+        'key_variance',         # key --> dimension or None
+        'request_variance',     # request --> VarianceRecord
+        'record_variance',      # request, key, val
+        'set_variance_headers',  # subscriber for IPubBeforeCommit
+        ]
+
+GLOBAL = 'global'
+LANGUAGE = 'language'
+USER = 'user'
+SESSION = 'session'
+REQUEST = 'request'
+DIMENSIONS = (GLOBAL, LANGUAGE, USER, SESSION, REQUEST)
+
+KEY_VARIANCE = {
+    LANGUAGE: ['current_lang', 'my_translation'],
+    USER: ['identity', 'user_object', 'user_id', 'logged_in',
+           'author_object', 'user_email', 'is_member_of', 'is_mine',
+           'has_perm'],
+    SESSION: ['session', 'gid', 'group_title'],
+    REQUEST: ['request_clock', 'timestamp_fn', 'thread_ident', 'counter',
+              'counters', 'request', 'request_var', 'request_vars',
+              'response', 'PDFCreator'],
+    GLOBAL: ['my_uid', 'context_as_brain', 'cooperating_groups',
+             'portal_type', 'context_url', 'context_title', 'context_owner',
+             'book_index', 'st_num', 'isBook', 'isPresentation',
+             'isStructual', 'bracket_default', 'uid2brain', 'uid2url',
+             'uid2fullpath', 'uid2path', 'uid2groups', '_uids2paths',
+             'managed_group_title', 'template_id', 'portal_url',
+             'portal_object', 'temp_folder', 'site_object',
+             'portal_and_site_objects', 'portal_id', 'desktop_brain',
+             # (its current_lang is recorded as such, when used):
+             'view_state',
+             'desktop_url', 'has_uid', 'skip_desktop_crumbs',
+             'personal_desktop_done', 'group_desktop_done',
+             'management_center_done', 'is_view_template', 'view_url',
+             'view_template_id', 'view_template_done', 'export_profile',
+             'export_profile_title', 'image-size-steps',
+             'image-print-factor', '_nesting_depth', '_context_printed',
+             'path', 'named_width', 'named_sizes', 'devmode',
+             'print_px_factor'],
+    }
+_VARIANCE = {}  # key --> dimension
+for dimension, keys in KEY_VARIANCE.items():
+    for key in keys:
+        _VARIANCE[key] = dimension
+del dimension, keys, key
+# the values which make up the fingerprint:
+VALUE_KEYS = {
+    'current_lang': LANGUAGE,
+    'user_id': USER,
+    'gid': SESSION,
+    }
+CACHE_KEY = 'variance'
+
+
+def register_variance(key, dimension):
+    if dimension not in DIMENSIONS:
+        raise ValueError('Unknown dimension %(dimension)r'
+                         ' (key %(key)r)' % locals())
+    _VARIANCE[key] = dimension
+
+
+def key_variance(key):
+    """
+    Return the dimension of the given info key; None, if unknown
+
+    >>> key_variance('gid'), key_variance('audit-mode')
+    ('session', 'global')
+    """
+    try:
+        return _VARIANCE[key]
+    except KeyError:
+        for var in REQUEST_VARS:  # taken from the URL
+            if var.name == key:
+                return GLOBAL
+        return None
+
+
+class VarianceRecord(object):
+    """
+    The dimensions (and fingerprint values) of the keys used in a request
+    """
+
+    def __init__(self):
+        self.dimensions = set()
+        self.values = {}
+        self.unclassified = set()
+
+    def record(self, key, val):
+        dimension = key_variance(key)
+        if dimension is None:
+            self.unclassified.add(key)
+            dimension = REQUEST
+        if dimension != GLOBAL:
+            self.dimensions.add(dimension)
+        if key in VALUE_KEYS:
+            self.values[VALUE_KEYS[key]] = val
+        elif key == 'identity':  # the source of all user keys
+            self.values.setdefault(USER, getattr(val, 'user_id', None))
+
+    def vary(self):
+        return frozenset(self.dimensions)
+
+    def fingerprint(self):
+        """
+        Return a hex digest of the values the output depends on;
+        None, if it varies per request or a value is unknown
+        """
+        if REQUEST in self.dimensions:
+            return None
+        parts = []
+        for dimension in sorted(self.dimensions):
+            if dimension not in self.values:
+                return None
+            parts.append('%s=%r' % (dimension, self.values[dimension]))
+        return sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def request_variance(request):
+    cache = request_cache(request)
+    try:
+        return cache[CACHE_KEY]
+    except KeyError:
+        record = cache[CACHE_KEY] = VarianceRecord()
+        return record
+
+
+def record_variance(request, key, val):
+    request_variance(request).record(key, val)
+
+
+def set_variance_headers(event):
+    """
+    Subscriber for ZPublisher.interfaces.IPubBeforeCommit:
+    add the X-Infohubs-Vary and X-Infohubs-Fingerprint headers,
+    if the variance-headers option is switched on
+    """
+    if not config_flag('variance-headers'):
+        return
+    request = event.request
+    other = getattr(request, 'other', None) or {}
+    record = (other.get(REQUEST_CACHE_KEY) or {}).get(CACHE_KEY)
+    if record is None:  # no info keys used
+        return
+    response = request.response
+    response.setHeader('X-Infohubs-Vary',
+                       ', '.join(sorted(record.vary())) or GLOBAL)
+    fingerprint = record.fingerprint()
+    if fingerprint is not None:
+        response.setHeader('X-Infohubs-Fingerprint', fingerprint)
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
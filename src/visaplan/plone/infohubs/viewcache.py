@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Process-wide cache of browser view factories, including missing ones
+
+hub[name] for browsers (e.g. hub['book'], hub['structuretype']) used to
+traverse to '@@name' each time; for browsers of add-ons which are not
+installed, every hub repeated the failed traversal.  Now the view factory
+is looked up once per site, interfaces of context and request and name; a
+missing view is cached as well.  The cache is forgotten when the component
+registry changes.
+
+>>> from zope.component import provideAdapter
+>>> from zope.interface import Interface, implementer
+>>> class IThing(Interface):
+...     pass
+>>> @implementer(IThing)
+... class Thing(object):
+...     pass
+>>> class Request(object):
+...     pass
+>>> class FooView(object):
+...     def __init__(self, context, request):
+...         self.context, self.request = context, request
+>>> provideAdapter(FooView, (IThing, Interface), Interface, name='foo')
+>>> view_factory(Thing(), Request(), 'foo') is FooView
+True
+>>> view_factory(Thing(), Request(), 'bar') is None
+True
+>>> sorted([key[-1] for key in _CACHE])
+['bar', 'foo']
+>>> invalidate_views()
+>>> _CACHE
+{}
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from threading import Lock
+
+# Zope:
+from AccessControl import getSecurityManager
+from ZODB.POSException import ConflictError
+from zope.component import getSiteManager
+from zope.interface import Interface, providedBy
+
+# Local imports:
+from .utils import site_key
+
+__all__ = [
+        'view_factory',      # context, request, name --> factory or None
+        'get_browser',       # context, name --> view or None
+        'invalidate_views',  # subscriber for IRegistrationEvent
+        ]
+
+MISSING = object()
+_CACHE = {}  # (site, context ifaces, request ifaces, name) --> factory
+_LOCK = Lock()
+
+
+def view_factory(context, request, name):
+    """
+    Return the factory of the named view for context and request,
+    or None if there is no such view
+    """
+    required = (providedBy(context), providedBy(request))
+    key = (site_key(),) + required + (name,)
+    factory = _CACHE.get(key)
+    if factory is None:
+        factory = getSiteManager().adapters.lookup(required, Interface, name)
+        if factory is None:
+            factory = MISSING
+        with _LOCK:
+            _CACHE[key] = factory
+    if factory is MISSING:
+        return None
+    return factory
+
+
+def get_browser(context, name):
+    """
+    Like context.restrictedTraverse('@@' + name, None),
+    but without traversal for known (or known to be missing) views
+    """
+    request = getattr(context, 'REQUEST', None)
+    if request is None:
+        return context.restrictedTraverse('@@' + name, None)
+    factory = view_factory(context, request, name)
+    if factory is None:
+        return None
+    # like OFS.Traversable, which returns the default for any error:
+    try:
+        view = factory(context, request)
+        if hasattr(view, '__of__'):
+            view = view.__of__(context)
+        if not getSecurityManager().validate(context, context, '@@' + name,
+                                             view):
+            return None
+    except ConflictError:
+        raise
+    except Exception:
+        return None
+    return view
+
+
+def invalidate_views(event=None):
+    """
+    Forget all cached view factories;
+    subscriber for zope.interface.interfaces.IRegistrationEvent
+    """
+    if _CACHE:
+        with _LOCK:
+            _CACHE.clear()
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
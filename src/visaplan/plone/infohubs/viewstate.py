@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Snapshot of the Plone context and portal state
+
+The info keys is_view_template, view_url, view_template_id, portal_object
+and portal_url are taken from one ViewState record, which is created in a
+single pass over @@plone_context_state and @@plone_portal_state and kept
+in the request (per context); current_lang is the language negotiated once
+per request (see .translations).
+
+>>> class ContextState(object):
+...     def is_view_template(self):
+...         return True
+...     def view_url(self):
+...         return 'http://nohost/plone/doc/view'
+...     def view_template_id(self):
+...         return 'document_view'
+>>> class PortalState(object):
+...     def portal(self):
+...         return '<portal>'
+...     def portal_url(self):
+...         return 'http://nohost/plone'
+...     def language(self):
+...         return 'de'
+>>> class Context(object):
+...     def getPhysicalPath(self):
+...         return ('', 'plone', 'doc')
+>>> class Request(object):
+...     def __init__(self):
+...         self.other = {}
+>>> hub = {'plone_context_state': ContextState(),
+...        'plone_portal_state': PortalState()}
+>>> request = Request()
+>>> state = view_state(hub, Context(), request)
+>>> state.portal_url, state.view_template_id, state.current_lang
+('http://nohost/plone', 'document_view', 'de')
+>>> view_state({}, Context(), request) is state
+True
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from collections import namedtuple
+
+# Local imports:
+from .translations import request_language
+from .utils import request_cache
+
+__all__ = [
+        'ViewState',
+        'view_state',  # hub, context, request --> ViewState
+        ]
+
+CACHE_KEY = 'view_states'
+
+ViewState = namedtuple('ViewState', [
+    # from @@plone_context_state:
+    'is_view_template',
+    'view_url',
+    'view_template_id',
+    # from @@plone_portal_state:
+    'current_lang',
+    'portal',
+    'portal_url',
+    ])
+
+
+def view_state(hub, context, request):
+    """
+    Return the ViewState of the given context, creating it if necessary
+    """
+    states = request_cache(request).setdefault(CACHE_KEY, {})
+    key = tuple(context.getPhysicalPath())
+    try:
+        return states[key]
+    except KeyError:
+        pass
+    context_state = hub['plone_context_state']
+    portal_state = hub['plone_portal_state']
+    state = states[key] = ViewState(
+            is_view_template=context_state.is_view_template(),
+            view_url=context_state.view_url(),
+            view_template_id=context_state.view_template_id(),
+            current_lang=request_language(hub, request),
+            portal=portal_state.portal(),
+            portal_url=portal_state.portal_url(),
+            )
+    return state
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
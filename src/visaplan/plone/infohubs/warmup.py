@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Warm-up of the caches, at process start or on demand
+
+After a restart, the first requests to each worker process pay for every
+cold process-level cache: lazily imported integrations, view factories
+(including missing ones), well-known objects, parsed named sizes etc.  The
+warm-up creates hubs for configured contexts and resolves the configured
+keys ahead of time, without a real HTTP request, and reports the time taken
+per key:
+
+    <product-config visaplan.plone.infohubs>
+        warmup-paths /plone /plone/some/folder
+        # optional; by default, WARMUP_KEYS and WARMUP_HUB_KEYS:
+        warmup-keys desktop_brain named_sizes
+        warmup-hub-keys book structuretype
+    </product-config>
+
+Only keys whose values (or the lookups behind them) are cached beyond the
+request are worth warming; e.g. info['portal_url'] or hub['portal_catalog']
+are kept per request or hub only.  Since the view factories are cached per
+request interfaces, the startup request is given the browser layers of the
+site, like a real request which traverses it.
+
+The paths are physical paths (from the Zope root).  Managers can run the
+warm-up for the configured paths (or, by default, for the current context)
+using the @@infohubs-warmup view.
+
+>>> class Context(dict):
+...     pass
+>>> report = warmup_context(Context(), keys=['nonexisting_key'],
+...                         hub_keys=[], make_hubs=lambda c: ({}, {}))
+>>> [(row[0], row[1], row[3]) for row in report]
+[('info', 'nonexisting_key', "KeyError('nonexisting_key')")]
+>>> print(format_report([('/plone',) + row for row in report]))
+/plone info[nonexisting_key]: 0.0000 s (KeyError('nonexisting_key'))
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from timeit import default_timer
+
+# Zope:
+from ZODB.POSException import ConflictError
+from zope.component.interfaces import ISite
+from zope.event import notify
+from zope.interface import directlyProvidedBy, directlyProvides
+from zope.traversing.interfaces import BeforeTraverseEvent
+
+try:
+    # Zope:
+    from zope.component.hooks import getSite, setSite
+except ImportError:  # zope.app.component ist veraltet ...
+    # Zope:
+    from zope.app.component.hooks import getSite, setSite
+
+# Local imports:
+from .config import config_list, product_config
+from .integrations import warmup_integrations
+from .manifest import order_hub_keys, order_info_keys
+from .pdfpool import checkin_pdfcreators
+
+# Logging / Debugging:
+import logging
+
+__all__ = [
+        'WARMUP_KEYS',
+        'WARMUP_HUB_KEYS',
+        'warmup_context',     # context [, keys, hub_keys] --> report rows
+        'warmup',             # app [, paths, keys, hub_keys, ...] --> report
+        'format_report',      # report --> str
+        'warmup_on_startup',  # subscriber for IProcessStarting
+        ]
+
+logger = logging.getLogger('visaplan.plone.infohubs')
+
+# keys backed by process-level caches:
+WARMUP_KEYS = [
+    'desktop_brain',    # .wellknown
+    'named_sizes',      # .utils.parse_named_sizes
+    'bracket_default',  # .integrations
+    ]
+WARMUP_HUB_KEYS = [     # view factories (.viewcache)
+    'book',
+    'presentation',
+    'structuretype',
+    'structurenumber',
+    ]
+
+
+def warmup_context(context, keys=None, hub_keys=None, make_hubs=None):
+    """
+    Create hubs for the given context and resolve the given keys;
+    return a list of (hubtype, key, seconds, error) tuples
+    """
+    if make_hubs is None:
+        # Local imports:
+        from .hubs import make_hubs
+    if keys is None:
+        keys = config_list('warmup-keys', WARMUP_KEYS)
+    if hub_keys is None:
+        hub_keys = config_list('warmup-hub-keys', WARMUP_HUB_KEYS)
+    hub, info = make_hubs(context)
+    res = []
+    for hubtype, dic, ordered in [
+            ('hub', hub, order_hub_keys(hub_keys)),
+            ('info', info, order_info_keys(keys)),
+            ]:
+        for key in ordered:
+            error = None
+            started = default_timer()
+            try:
+                dic[key]
+            except ConflictError:
+                raise
+            except Exception as e:
+                error = repr(e)
+            res.append((hubtype, key, default_timer() - started, error))
+    return res
+
+
+def _site_of(obj):
+    for item in obj.aq_chain:
+        if ISite.providedBy(item):
+            return item
+    return None
+
+
+def warmup(app, paths=None, keys=None, hub_keys=None, mark_layers=False):
+    """
+    Warm up the caches for the given (by default: the configured) physical
+    paths; return a list of (path, hubtype, key, seconds, error) tuples.
+
+    The app should have a request (see Testing.makerequest); the
+    integrations are imported first.  With mark_layers=True, the request is
+    given the browser layers of each site (for requests which didn't
+    traverse it).
+    """
+    request = getattr(app, 'REQUEST', None)
+    res = []
+    for name, timing in sorted(warmup_integrations().items()):
+        res.append(('', 'integration', name,
+                    (timing['import_seconds'] or 0)
+                    + (timing['init_seconds'] or 0),
+                    timing['error']))
+    if paths is None:
+        paths = config_list('warmup-paths')
+    for path in paths:
+        try:
+            context = app.unrestrictedTraverse(path)
+        except (AttributeError, KeyError) as e:
+            res.append((path, 'path', path, 0.0, repr(e)))
+            continue
+        site = _site_of(context)
+        old_site = getSite()
+        setSite(site)
+        provided = None
+        if mark_layers and request is not None and site is not None:
+            # like the subscribers of plone.browserlayer and plone.theme
+            # do when a request traverses the site:
+            provided = directlyProvidedBy(request)
+            notify(BeforeTraverseEvent(site, request))
+        try:
+            for row in warmup_context(context, keys, hub_keys):
+                res.append((path,) + row)
+        finally:
+            if request is not None:
+                checkin_pdfcreators(request)
+            if provided is not None:
+                directlyProvides(request, provided)
+            setSite(old_site)
+    return res
+
+
+def format_report(report):
+    lines = []
+    for path, hubtype, key, seconds, error in report:
+        line = '%s %s[%s]: %.4f s' % (path, hubtype, key, seconds)
+        if error:
+            line += ' (%s)' % error
+        lines.append(line.lstrip())
+    return '\n'.join(lines)
+
+
+def warmup_on_startup(event):
+    """
+    Subscriber for zope.processlifetime.IProcessStarting:
+    warm up the caches if the warmup-paths option is given
+    """
+    if not product_config().get('warmup-paths'):
+        return
+    # Zope:
+    import transaction
+    import Zope2
+    from Testing.makerequest import makerequest
+    app = makerequest(Zope2.app())
+    started = default_timer()
+    try:
+        report = warmup(app, mark_layers=True)
+    except Exception:
+        logger.exception('warm-up failed')
+        return
+    finally:
+        transaction.abort()
+        app._p_jar.close()
+    logger.info('warm-up done (%.3f s):\n%s',
+                default_timer() - started, format_report(report))
+
+
+if __name__ == '__main__':
+    # Standard library:
+    import doctest
+    doctest.testmod()
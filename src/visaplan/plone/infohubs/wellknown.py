@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*- vim: ts=8 sts=4 sw=4 si et tw=79
+"""\
+Per-site cache of well-known objects, given by their UIDs
+
+Some objects (e.g. the "desktop" of the Unitracc sites) are looked up by
+UIDs which are constant per site.  Once resolved, their catalog record id
+and physical path are kept, together with the modification counter of the
+catalog; as long as the counter is unchanged, the brain is taken directly
+from the catalog (by record id) and the URL is computed from the path,
+without any catalog query.  Since the counter is changed in every ZEO
+client, the entries can't become stale because of changes done in other
+processes.
+
+The well-known objects are declared by name, with either a UID or the name
+of a lazily imported integration (see .integrations) which holds the UID:
+
+>>> register_wellknown('home', uid='0123456789abcdef')
+>>> WELLKNOWN['home']
+{'uid': '0123456789abcdef', 'integration': None}
+
+When the catalog counter changes (e.g. after a reindexing in another ZEO
+client), the entry is looked up again:
+
+>>> class Index(object):
+...     _index = {'0123456789abcdef': 7}
+>>> class Catalog(object):
+...     counter = 1
+...     paths = {7: '/plone/home'}
+...     def getIndex(self, name):
+...         return Index()
+...     def getCounter(self):
+...         return self.counter
+>>> catalog = Catalog()
+>>> catalog._catalog = catalog
+>>> hub = {'portal_catalog': catalog}
+>>> wellknown_path(hub, 'home')
+'/plone/home'
+>>> catalog.paths[7] = '/plone/welcome'
+>>> wellknown_path(hub, 'home')
+'/plone/home'
+>>> catalog.counter += 1
+>>> wellknown_path(hub, 'home')
+'/plone/welcome'
+>>> unregister_wellknown('home')
+
+For old catalogs without a counter, the record id is checked to still
+point to the cached path; furthermore, the cached entries are forgotten when
+an object is moved or renamed which is (or contains) one of them (or, if one
+of them was missing, when an object is added).
+"""
+
+# Python compatibility:
+from __future__ import absolute_import
+
+# Standard library:
+from threading import Lock
+
+# Local imports:
+from .integrations import integration
+from .urls import request_urls
+from .utils import catalog_counter, site_key
+
+__all__ = [
+        'register_wellknown',    # name, uid=... or integration=...
+        'unregister_wellknown',  # name
+        'wellknown_path',        # hub, name --> physical path or None
+        'wellknown_brain',       # hub, name --> brain or None
+        'wellknown_url',         # hub, request, name --> URL or None
+        'object_moved',          # subscriber for IObjectMovedEvent
+        ]
+
+WELLKNOWN = {}  # name --> {'uid': ..., 'integration': ...}
+_CACHE = {}     # site key --> {name: (counter, rid, path)}
+_LOCK = Lock()
+
+
+def register_wellknown(name, uid=None, integration=None):
+    if (uid is None) == (integration is None):
+        raise TypeError('Please specify *either* uid *or* integration'
+                        ' (for %(name)r)' % locals())
+    WELLKNOWN[name] = {'uid': uid,
+                       'integration': integration,
+                       }
+    invalidate_wellknown()
+
+
+def unregister_wellknown(name):
+    del WELLKNOWN[name]
+    invalidate_wellknown()
+
+
+def _uid(name):
+    spec = WELLKNOWN[name]
+    if spec['uid'] is not None:
+        return spec['uid']
+    return integration(spec['integration'])
+
+
+def _lookup(hub, name):
+    """
+    Return a (counter, rid, path) tuple; rid and path are None if the object
+    is not cataloged
+    """
+    key = site_key()
+    cache = _CACHE.get(key)
+    if cache is None:
+        cache = _CACHE.setdefault(key, {})
+    portal_catalog = hub['portal_catalog']
+    counter = catalog_counter(portal_catalog)
+    catalog = portal_catalog._catalog
+    entry = cache.get(name)
+    if entry is not None and entry[0] == counter:
+        if counter is not None:
+            return entry
+        rid, path = entry[1:]
+        if rid is None or catalog.paths.get(rid) == path:
+            return entry
+    rid = catalog.getIndex('UID')._index.get(_uid(name))
+    if rid is not None and not isinstance(rid, int):  # FieldIndex
+        rid = rid.minKey()
+    if rid is None:
+        entry = (counter, None, None)
+    else:
+        entry = (counter, rid, catalog.paths.get(rid))
+    with _LOCK:
+        cache[name] = entry
+    return entry
+
+
+def wellknown_path(hub, name):
+    return _lookup(hub, name)[2]
+
+
+def wellknown_brain(hub, name):
+    rid = _lookup(hub, name)[1]
+    if rid is not None:
+        return hub['portal_catalog']._catalog[rid]
+
+
+def wellknown_url(hub, request, name):
+    path = wellknown_path(hub, name)
+    if path is not None:
+        return request_urls(request).url(path)
+
+
+def invalidate_wellknown():
+    with _LOCK:
+        _CACHE.clear()
+
+
+def object_moved(obj, event):
+    """
+    Subscriber for IObjectMovedEvent (which includes renaming):
+    forget the cached entries if a well-known object (or a container of
+    one) is moved
+    """
+    if event.oldParent is None:  # added
+        for cache in list(_CACHE.values()):
+            for entry in list(cache.values()):
+                if entry[1] is None:  # perhaps this one
+                    invalidate_wellknown()
+                    return
+        return
+    old = '/'.join(event.oldParent.getPhysicalPath() + (event.oldName,))
+    prefix = old + '/'
+    for cache in list(_CACHE.values()):
+        for entry in list(cache.values()):
+            path = entry[2]
+            if path is None:
+                continue
+            if path == old or path.startswith(prefix):
+                invalidate_wellknown()
+                return
+
+
+register_wellknown('desktop', integration='MYUNITRACC_UID')